@@ -0,0 +1,186 @@
+"""
+AST 的紧凑表示: 所有节点保存在几个平行的数组中, 不需要为每个节点创建 python 对象.
+    kinds[i]         节点 i 的类型, 即 classes 中的下标
+    offsets[i]       节点 i 的属性在 operands 中的起始位置, 结束位置为 offsets[i + 1]
+    operands         按 parser.field_names 的顺序排列的属性值:
+                     非负数 n 表示下标为 n 的节点, 负数 -1 - k 表示 constants[k]
+    constants        Token, 字符串, 数字, bool, None 等, 相同的常量只保存一份
+列表属性 (如 Block.declarations) 也是一个节点, 类型为 list, 属性值就是列表的元素.
+节点按后序排列, 子节点总是在父节点之前, 最后一个节点是根节点.
+"""
+import functools
+from array import array
+
+import parser
+from lexer import Token
+from visitor import NodeVisitor
+
+# 所有的节点类型, 最后的 list 表示列表
+classes = [
+    cls
+    for cls in vars(parser).values()
+    if isinstance(cls, type) and issubclass(cls, parser.Node) and cls is not parser.Node
+] + [list]
+kind_of = {cls: kind for kind, cls in enumerate(classes)}
+
+# 运行时的内联缓存, 不保存, 还原时设置为默认值
+transient_fields = {"cache_target": None, "cache_version": None}
+
+
+@functools.cache
+def stored_fields(cls):
+    """保存在 operands 中的属性名"""
+    if cls is list:
+        return ()
+    return tuple(
+        name for name in parser.field_names(cls) if name not in transient_fields
+    )
+
+
+def constant_key(value):
+    """相同的 key 对应同一个常量. 0.0 和 -0.0 相等但是不能合并, 所以 float 按 repr 区分"""
+    if value.__class__ is Token:
+        return Token, value.type, constant_key(value.value)
+    if value.__class__ is float:
+        return float, repr(value)
+    return value.__class__, value
+
+
+class Arena:
+    __slots__ = ("kinds", "offsets", "operands", "constants")
+
+    def __init__(self):
+        self.kinds = array("B")
+        self.offsets = array("i", [0])
+        self.operands = array("i")
+        self.constants = []
+
+    @classmethod
+    def from_tree(cls, root):
+        """转换对象表示的 AST"""
+        arena = cls()
+        Converter(arena).add(root)
+        return arena
+
+    @property
+    def root(self):
+        return len(self.kinds) - 1
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def nbytes(self):
+        """三个数组占用的字节数, 不包括常量"""
+        return sum(
+            len(values) * values.itemsize
+            for values in (self.kinds, self.offsets, self.operands)
+        )
+
+    def kind(self, index):
+        """节点的类型"""
+        return classes[self.kinds[index]]
+
+    def operand(self, index, name):
+        position = stored_fields(classes[self.kinds[index]]).index(name)
+        return self.operands[self.offsets[index] + position]
+
+    def decode(self, operand):
+        """节点返回下标, 常量返回常量的值"""
+        if operand >= 0:
+            return operand
+        return self.constants[-1 - operand]
+
+    def child(self, index, name):
+        """子节点的下标, 属性值为 None 时返回 None"""
+        return self.decode(self.operand(index, name))
+
+    def constant(self, index, name):
+        operand = self.operand(index, name)
+        assert operand < 0
+        return self.constants[-1 - operand]
+
+    def items(self, index, name):
+        """列表属性的元素: 节点返回下标, 常量返回常量的值"""
+        list_index = self.operand(index, name)
+        start = self.offsets[list_index]
+        end = self.offsets[list_index + 1]
+        return [self.decode(operand) for operand in self.operands[start:end]]
+
+    def children(self, index):
+        """所有子节点 (包括列表) 的下标"""
+        start = self.offsets[index]
+        end = self.offsets[index + 1]
+        return [operand for operand in self.operands[start:end] if operand >= 0]
+
+    def to_tree(self, index=None):
+        """还原为对象表示的 AST"""
+        if index is None:
+            index = self.root
+        cls = classes[self.kinds[index]]
+        values = [
+            self.to_tree(operand) if operand >= 0 else self.constants[-1 - operand]
+            for operand in self.operands[self.offsets[index] : self.offsets[index + 1]]
+        ]
+        if cls is list:
+            return values
+        node = cls.__new__(cls)
+        for name, value in zip(stored_fields(cls), values):
+            setattr(node, name, value)
+        for name, value in transient_fields.items():
+            if name in parser.field_names(cls):
+                setattr(node, name, value)
+        return node
+
+
+class Converter:
+    def __init__(self, arena):
+        self.arena = arena
+        # constant_key -> 常量的编号
+        self.constant_index = {}
+
+    def constant(self, value):
+        key = constant_key(value)
+        try:
+            index = self.constant_index[key]
+        except KeyError:
+            index = self.constant_index[key] = len(self.arena.constants)
+            self.arena.constants.append(value)
+        return -1 - index
+
+    def operand(self, value):
+        if isinstance(value, (parser.Node, list)):
+            return self.add(value)
+        return self.constant(value)
+
+    def add(self, value):
+        """添加节点或者列表 (以及它们的子节点), 返回节点的下标"""
+        if value.__class__ is list:
+            operands = [self.operand(item) for item in value]
+        else:
+            operands = [
+                self.operand(getattr(value, name))
+                for name in stored_fields(value.__class__)
+            ]
+        arena = self.arena
+        arena.kinds.append(kind_of[value.__class__])
+        arena.operands.extend(operands)
+        arena.offsets.append(len(arena.operands))
+        return len(arena.kinds) - 1
+
+
+class ArenaVisitor(NodeVisitor):
+    """
+    遍历 Arena 中的节点, 与 NodeVisitor 一样按节点类型分派到 visit_<类名>,
+    参数是节点的下标, 通过 self.arena 读取节点的属性
+    """
+
+    def __init__(self, arena):
+        self.arena = arena
+
+    def visit(self, index):
+        node_class = classes[self.arena.kinds[index]]
+        try:
+            fn = self._dispatch_table[node_class]
+        except KeyError:
+            fn = self._lookup(node_class)
+        return fn(self, index)
@@ -0,0 +1,28 @@
+# 比较同一个算法的两种实现: bench(f, n) 返回每次调用耗时的 [最小值, 中位数, 平均值] (纳秒)
+func fib_loop(n):
+    var a = 0
+    var b = 1
+    for (var i = 0; i < n; i = i + 1):
+        var t = a + b
+        a = b
+        b = t
+    return a
+
+# 修改全局变量 calls, fib_rec 不是纯函数, 每次调用都会执行, 不使用缓存的结果
+var calls = 0
+func fib_rec(n):
+    calls = calls + 1
+    if n <= 2:
+        return n
+    return fib_rec(n - 2) + fib_rec(n - 1)
+
+func run_loop():
+    return fib_loop(20)
+
+func run_rec():
+    return fib_rec(15)
+
+var start = clock()
+print("loop", bench(run_loop, 50))
+print("recursive", bench(run_rec, 50))
+print("total ns", clock() - start)
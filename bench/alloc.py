@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""统计执行 y 脚本时创建的运行时对象个数, 内存峰值和耗时"""
+import argparse
+import collections
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import interpreter
+from closure import ClosureInterpreter
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from transpiler import PythonInterpreter
+from vm import VM
+
+engines = {
+    "tree": interpreter.Interpreter,
+    "vm": VM,
+    "closure": ClosureInterpreter,
+    "python": PythonInterpreter,
+}
+
+# 需要统计的运行时对象
+classes = [
+    interpreter.Number,
+    interpreter.String,
+    interpreter.Array,
+    interpreter.And,
+    interpreter.Or,
+    interpreter.Not,
+    interpreter.Return,
+    interpreter.Function,
+    interpreter.ActivationRecord,
+]
+
+
+def parse(filename):
+    with open(filename) as fp:
+        ast = Parser(Scanner(fp.read()).tokens()).run()
+    Resolver().run(ast)
+    return ast
+
+
+def run(engine, filename):
+    # 输出丢弃, 只关心执行过程
+    with contextlib.redirect_stdout(io.StringIO()):
+        engines[engine]().run(parse(filename))
+
+
+@contextlib.contextmanager
+def count_objects(counter):
+    """替换各个类的 __init__, 记录创建的对象个数"""
+    originals = {cls: cls.__dict__["__init__"] for cls in classes}
+
+    def make_init(cls, init):
+        def counting_init(self, *args, **kwargs):
+            counter[cls.__name__] += 1
+            init(self, *args, **kwargs)
+
+        return counting_init
+
+    for cls, init in originals.items():
+        cls.__init__ = make_init(cls, init)
+    try:
+        yield counter
+    finally:
+        for cls, init in originals.items():
+            cls.__init__ = init
+
+
+def peak_memory(engine, filename):
+    """执行期间 python 分配的内存的峰值 (不包括解析)"""
+    ast = parse(filename)
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            engines[engine]().run(ast)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="bench-alloc")
+    arg_parser.add_argument("file", help="要执行的y脚本文件")
+    arg_parser.add_argument("--engine", choices=list(engines), default="tree")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    # 先计时, 统计对象个数时替换的 __init__ 会影响之后的执行速度
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        run(args.engine, args.file)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    counter = collections.Counter()
+    with count_objects(counter):
+        run(args.engine, args.file)
+    for name, count in counter.most_common():
+        print("%-20s %10d" % (name, count))
+    print("%-20s %10d" % ("total", sum(counter.values())))
+    print(
+        "%-20s %10.1f KiB" % ("peak memory", peak_memory(args.engine, args.file) / 1024)
+    )
+    print("%-20s %10.3f s" % ("time", best))
+
+
+if __name__ == "__main__":
+    main()
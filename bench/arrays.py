@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""比较大数组使用 list 和 array 保存时占用的内存"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import interpreter
+from interpreter import Array
+
+kinds = {
+    "int": lambda size: list(range(size)),
+    "float": lambda size: [i * 0.5 for i in range(size)],
+}
+
+
+def measure(make_elements, size, typed):
+    """返回 (占用的字节数, 求和耗时)"""
+    pack = interpreter.pack
+    if not typed:
+        interpreter.pack = lambda elements: elements
+    try:
+        tracemalloc.start()
+        array = Array(make_elements(size))
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    finally:
+        interpreter.pack = pack
+
+    start = time.perf_counter()
+    total = 0
+    for i in range(len(array.elements)):
+        total += array.elements[i]
+    return memory, time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="bench-arrays")
+    arg_parser.add_argument(
+        "--size", type=int, nargs="+", default=[10**5, 10**6, 10**7]
+    )
+    args = arg_parser.parse_args()
+
+    print(
+        "%-6s %10s %12s %12s %10s %10s"
+        % ("kind", "size", "list", "array", "ratio", "read")
+    )
+    for kind, make_elements in kinds.items():
+        for size in args.size:
+            list_memory, list_time = measure(make_elements, size, typed=False)
+            array_memory, array_time = measure(make_elements, size, typed=True)
+            print(
+                "%-6s %10d %10.1fMB %10.1fMB %9.1fx %9.2fx"
+                % (
+                    kind,
+                    size,
+                    list_memory / 2**20,
+                    array_memory / 2**20,
+                    list_memory / array_memory,
+                    list_time / array_time,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
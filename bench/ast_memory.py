@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""比较大脚本的 AST 使用对象表示和 Arena 表示时占用的内存"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from arena import Arena
+from arena import ArenaVisitor
+from interpreter import Interpreter
+from parser import FunctionCall
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+from transpiler import walk
+
+# 每段 10 行, {i} 替换为段的编号
+template = """\
+func f{i}(a, b):
+    var t = a * 2 + b
+    if t > 10 && b != 0:
+        return t - 1
+    elif t == 3:
+        return -t
+    return t % 7
+var x{i} = f{i}({i}, 3)
+for (var j = 0; j < 2; j = j + 1):
+    total = total + x{i} + j
+"""
+
+
+def generate(lines):
+    return (
+        "var total = 0\n"
+        + "".join(template.format(i=i) for i in range(lines // 10))
+        + "print(total)\n"
+    )
+
+
+class CallCounter(ArenaVisitor):
+    """统计函数调用的个数, 不创建节点对象"""
+
+    def __init__(self, arena):
+        super().__init__(arena)
+        self.count = 0
+
+    def visit_FunctionCall(self, index):
+        self.count += 1
+        self.visit_Unknown(index)
+
+    def visit_Unknown(self, index):
+        for child in self.arena.children(index):
+            self.visit(child)
+
+
+def output(ast):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        Interpreter().run(ast)
+    return stdout.getvalue()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="bench-ast-memory")
+    arg_parser.add_argument("--lines", type=int, default=100000, help="生成的脚本行数")
+    args = arg_parser.parse_args()
+
+    source = generate(args.lines)
+    gc.collect()
+    tracemalloc.start()
+    ast = Parser(Scanner(source).tokens()).run()
+    Resolver().run(ast)
+    gc.collect()
+    tree_memory = tracemalloc.get_traced_memory()[0]
+
+    arena = Arena.from_tree(ast)
+    tree_pickle = len(pickle.dumps(ast, pickle.HIGHEST_PROTOCOL))
+    tree_calls = sum(isinstance(node, FunctionCall) for node in walk(ast))
+    expected = output(ast)
+    del ast
+    gc.collect()
+    # 常量 (Token 等) 在解析时创建, 也计算在内
+    arena_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    counter = CallCounter(arena)
+    counter.visit(arena.root)
+    assert counter.count == tree_calls
+    # tracemalloc 会大幅拖慢执行, 停止之后再计时
+    start = time.perf_counter()
+    restored = arena.to_tree()
+    restore_time = time.perf_counter() - start
+    assert output(restored) == expected
+    start = time.perf_counter()
+    Arena.from_tree(restored)
+    convert_time = time.perf_counter() - start
+
+    print("lines           %10d" % source.count("\n"))
+    print("nodes           %10d" % len(arena))
+    print("constants       %10d" % len(arena.constants))
+    print("tree memory     %10.1f MiB" % (tree_memory / 2**20))
+    print("arena memory    %10.1f MiB" % (arena_memory / 2**20))
+    print("tree pickle     %10.1f MiB" % (tree_pickle / 2**20))
+    print(
+        "arena pickle    %10.1f MiB"
+        % (len(pickle.dumps(arena, pickle.HIGHEST_PROTOCOL)) / 2**20)
+    )
+    print("to arena        %10.3f s" % convert_time)
+    print("to tree         %10.3f s" % restore_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""NodeVisitor 分派开销的微基准: 对比逐次 getattr 分派与缓存的分派表"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parser
+from lexer import Token
+from lexer import TokenType
+from visitor import NodeVisitor
+
+
+class GetattrNodeVisitor:
+    """优化前的 NodeVisitor.visit 实现"""
+
+    def visit(self, node):
+        fn_name = "visit_" + node.__class__.__name__
+        fn = getattr(self, fn_name, self.visit_Unknown)
+        return fn(node)
+
+
+def make_counter(base):
+    class Counter(base):
+        """对每个节点只做计数, 开销几乎全部来自分派"""
+
+        def __init__(self):
+            self.count = 0
+
+        def visit_Unknown(self, node):
+            self.count += 1
+
+        def visit_Program(self, node):
+            self.count += 1
+            for decl in node.declarations:
+                self.visit(decl)
+
+        def binary(self, node):
+            self.count += 1
+            self.visit(node.left)
+            self.visit(node.right)
+
+        visit_Add = binary
+        visit_Sub = binary
+        visit_Mul = binary
+        visit_Compare = binary
+
+        def visit_Number(self, node):
+            self.count += 1
+
+        def visit_Identifier(self, node):
+            self.count += 1
+
+    return Counter
+
+
+def generate_ast(statements, depth):
+    """生成 statements 条语句, 每条是深度为 depth 的完全二叉表达式树"""
+    kinds = [parser.Add, parser.Sub, parser.Mul]
+
+    def expr(level, index):
+        if level == 0:
+            if index % 2:
+                return parser.Identifier(Token(TokenType.ID, "x"))
+            return parser.Number(Token(TokenType.NUMBER, index))
+        left = expr(level - 1, index * 2)
+        right = expr(level - 1, index * 2 + 1)
+        if level == 1 and index % 5 == 0:
+            return parser.Compare(left, right, "<")
+        return kinds[(level + index) % 3](left, right)
+
+    return parser.Program([expr(depth, i) for i in range(statements)])
+
+
+def measure(visitor_class, tree, repeat):
+    best = None
+    for _ in range(repeat):
+        visitor = visitor_class()
+        start = time.perf_counter()
+        visitor.visit(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, visitor.count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="bench-dispatch")
+    arg_parser.add_argument("--statements", type=int, default=2000)
+    arg_parser.add_argument("--depth", type=int, default=8)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    tree = generate_ast(args.statements, args.depth)
+    rows = [
+        ("getattr", make_counter(GetattrNodeVisitor)),
+        ("dispatch table", make_counter(NodeVisitor)),
+    ]
+    baseline = None
+    for name, visitor_class in rows:
+        elapsed, count = measure(visitor_class, tree, args.repeat)
+        baseline = baseline or elapsed
+        print(
+            "%-16s %8d nodes  %8.3f s  %6.1f ns/node  %5.2fx"
+            % (name, count, elapsed, elapsed / count * 1e9, baseline / elapsed)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+前端 (词法分析和语法分析) 的吞吐量随源码规模的变化.
+生成不同形状的 y 程序 (大量函数, 深层嵌套, 长表达式, 长字符串, 频繁的缩进变化),
+在 1x/10x/100x 等规模下分别统计 token/s, 节点/s 和内存峰值.
+每个 token 或节点的耗时随规模明显增加时, 说明存在非线性的开销
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer
+from parser import Parser
+from scanner import Scanner
+from transpiler import walk
+
+lexers = {"scanner": Scanner, "lexer": Lexer}
+
+
+def functions(i):
+    return [
+        "func f%d(a, b):" % i,
+        "    var s = a",
+        "    if s > b:",
+        "        s = s - b",
+        "    else:",
+        "        s = s + b * 2",
+        "    return s",
+        "var r%d = f%d(%d, 3)" % (i, i, i),
+    ]
+
+
+def nesting(i, depth=16):
+    lines = ["var n%d = %d" % (i, i)]
+    name = "n%d" % i
+    for level in range(depth):
+        indent = "    " * level
+        keyword = "if" if level % 2 == 0 else "while"
+        lines.append("%s%s %s > %d:" % (indent, keyword, name, level + 1000000))
+        lines.append("%s    var v%d = %s + 1" % (indent, level, name))
+        name = "v%d" % level
+    lines.append("    " * depth + "print(%s)" % name)
+    return lines
+
+
+def expressions(i, terms=30):
+    ops = ["+", "-", "*", "%"]
+    parts = ["x"]
+    for term in range(terms):
+        operand = "(x + %d)" % term if term % 5 == 0 else str(term + 1)
+        parts.append(ops[term % 4])
+        parts.append(operand)
+    return ["var e%d = %s" % (i, " ".join(parts))]
+
+
+def strings(i, length=2000):
+    text = ("string %d " % i) * (length // 10)
+    return ['var s%d = "%s"' % (i, text[:length])]
+
+
+def indentation(i, depth=8):
+    """逐层缩进, 然后一次回到最外层"""
+    lines = []
+    for level in range(depth):
+        lines.append("    " * level + "if x != %d:" % (i + level))
+        lines.append("    " * (level + 1) + "x = x + 1")
+    return lines
+
+
+shapes = {
+    "functions": functions,
+    "nesting": nesting,
+    "expressions": expressions,
+    "strings": strings,
+    "indentation": indentation,
+}
+
+
+def generate(shape, lines):
+    """生成至少 lines 行的程序"""
+    result = ["var x = 1"]
+    i = 0
+    while len(result) < lines:
+        result.extend(shapes[shape](i))
+        i += 1
+    return "\n".join(result) + "\n"
+
+
+def best_of(repeat, function, *args):
+    """返回 (最后一次的结果, 最短的耗时)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def tokenize(lexer_class, source):
+    return list(lexer_class(source).tokens())
+
+
+def lex(lexer_class, source, repeat):
+    """返回 (token 列表, 耗时, 内存峰值)"""
+    tokens, elapsed = best_of(repeat, tokenize, lexer_class, source)
+
+    tracemalloc.start()
+    list(lexer_class(source).tokens())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return tokens, elapsed, peak
+
+
+def parse(tokens, repeat):
+    """返回 (节点个数, 耗时, 内存峰值)"""
+    ast, elapsed = best_of(repeat, lambda: Parser(tokens).run())
+    count = sum(1 for _ in walk(ast))
+    del ast
+
+    tracemalloc.start()
+    Parser(tokens).run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="bench-frontend")
+    arg_parser.add_argument(
+        "--shape", action="append", choices=list(shapes), help="默认测试全部"
+    )
+    arg_parser.add_argument("--lines", type=int, default=1000, help="1x 规模的行数")
+    arg_parser.add_argument(
+        "--scales",
+        default="1,10,100",
+        help="逗号分隔的规模倍数",
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3, help="计时取最短的一次")
+    arg_parser.add_argument("--lexer", choices=list(lexers), default="scanner")
+    arg_parser.add_argument("--emit", help="只将生成的程序写入文件 (使用第一个形状和规模)")
+    args = arg_parser.parse_args()
+    selected = args.shape or list(shapes)
+    scales = [int(scale) for scale in args.scales.split(",")]
+
+    if args.emit:
+        with open(args.emit, "w") as fp:
+            fp.write(generate(selected[0], args.lines * scales[0]))
+        return
+
+    print(
+        "%-12s %5s %8s %9s %11s %9s %10s %8s %11s %9s %10s"
+        % (
+            "shape",
+            "scale",
+            "lines",
+            "tokens",
+            "tokens/s",
+            "ns/token",
+            "lex peak",
+            "nodes",
+            "nodes/s",
+            "ns/node",
+            "parse peak",
+        )
+    )
+    for shape in selected:
+        for scale in scales:
+            source = generate(shape, args.lines * scale)
+            tokens, lex_time, lex_peak = lex(lexers[args.lexer], source, args.repeat)
+            nodes, parse_time, parse_peak = parse(tokens, args.repeat)
+            print(
+                "%-12s %4dx %8d %9d %11.0f %9.0f %6.1f MiB %8d %11.0f %9.0f %6.1f MiB"
+                % (
+                    shape,
+                    scale,
+                    source.count("\n"),
+                    len(tokens),
+                    len(tokens) / lex_time,
+                    lex_time / len(tokens) * 1e9,
+                    lex_peak / 2**20,
+                    nodes,
+                    nodes / parse_time,
+                    parse_time / nodes * 1e9,
+                    parse_peak / 2**20,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
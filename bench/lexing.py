@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""词法分析吞吐量: 对比逐字符的 Lexer 与基于正则表达式的 Scanner, 并逐个比较生成的 token"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import lexer
+from lexer import Lexer
+from scanner import Scanner
+
+# 覆盖所有 token 类型: 缩进/反缩进, 注释, 空行, 字符串, 整数/浮点数, 操作符
+TEMPLATE = """\
+# function %(n)d
+func f_%(n)d(a, b_1):
+    var total = 0
+    # comment inside block
+
+    for var i = 0; i < a; i = i + 1:
+        if i %% 3 == 0 && !(b_1 != nil):
+            total = total + i * 2 - 1 / 4
+        elif i >= 10 || i <= -2:
+            continue
+        else:
+              break
+    var s = "string %(n)d: {[,;]}"
+    var xs = [1, 2, 3.5 , a]
+    while total > 1.25 :
+        total = total - xs[0]
+    return total
+
+for x in range(%(n)d):
+    print(f_%(n)d(x, true), false, s)
+"""
+
+
+def generate(size):
+    """生成大约 size 字节的 y 源码"""
+    chunks = []
+    total = 0
+    n = 0
+    while total < size:
+        chunk = TEMPLATE % {"n": n}
+        chunks.append(chunk)
+        total += len(chunk)
+        n += 1
+    return "".join(chunks)
+
+
+def token_key(token):
+    return (token.type, token.value, type(token.value))
+
+
+def check(name, text):
+    """逐个比较两个实现生成的 token"""
+    expected = Lexer(text).tokens()
+    actual = Scanner(text).tokens()
+    count = 0
+    for old, new in zip(expected, actual):
+        if token_key(old) != token_key(new):
+            raise AssertionError("%s: token %d: %s != %s" % (name, count, old, new))
+        count += 1
+    if next(expected, None) is not None or next(actual, None) is not None:
+        raise AssertionError("%s: token count differs after %d tokens" % (name, count))
+    return count
+
+
+def measure(lexer_class, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in lexer_class(text).tokens())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="bench-lexing")
+    arg_parser.add_argument("--size", type=float, default=4, help="源码大小(MB)")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    text = generate(int(args.size * 1024 * 1024))
+    sources = [("generated", text)]
+    for path in sorted(glob.glob(os.path.join(ROOT, "*.y"))):
+        with open(path) as fp:
+            sources.append((os.path.basename(path), fp.read()))
+
+    for comment in (True, False):
+        lexer.skip_comment = comment
+        for name, source in sources:
+            check(name, source)
+    lexer.skip_comment = True
+    print("equivalence       %d files ok" % len(sources))
+
+    rows = [("Lexer", Lexer), ("Scanner", Scanner)]
+    baseline = None
+    for name, lexer_class in rows:
+        elapsed, count = measure(lexer_class, text, args.repeat)
+        baseline = baseline or elapsed
+        print(
+            "%-16s %8d tokens  %8.3f s  %6.2f MB/s  %5.2fx"
+            % (name, count, elapsed, len(text) / elapsed / 1e6, baseline / elapsed)
+        )
+
+
+if __name__ == "__main__":
+    main()
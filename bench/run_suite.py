@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+执行 bench/workloads 中的 y 脚本和对应的 python 脚本, 统计耗时和内存峰值.
+结果可以保存为 JSON, 之后的运行与其比较, 超过阈值的变慢视为性能回退
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+workload_dir = os.path.join(root, "bench", "workloads")
+engines = ["tree", "vm", "closure", "python"]
+
+
+def workloads():
+    return sorted(
+        os.path.splitext(name)[0]
+        for name in os.listdir(workload_dir)
+        if name.endswith(".y")
+    )
+
+
+def run_once(command):
+    """执行一次, 返回 (耗时, 内存峰值 KiB)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    # 已经由 wait4 回收, 避免 Popen 再次等待
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(
+            "%s exited with %d" % (" ".join(command), process.returncode)
+        )
+    # linux 中 ru_maxrss 的单位为 KiB
+    return elapsed, usage.ru_maxrss
+
+
+def percentile(values, p):
+    """最近秩法"""
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def measure(command, repeat):
+    times = []
+    memory = 0
+    for _ in range(repeat):
+        elapsed, maxrss = run_once(command)
+        times.append(elapsed)
+        memory = max(memory, maxrss)
+    return {
+        "median": statistics.median(times),
+        "p95": percentile(times, 95),
+        "memory": memory,
+    }
+
+
+def y_command(engine, name, memo_size):
+    return [
+        sys.executable,
+        os.path.join(root, "main.py"),
+        "--no-cache",
+        "--engine=%s" % engine,
+        "--memo-size=%d" % memo_size,
+        os.path.join(workload_dir, name + ".y"),
+    ]
+
+
+def python_command(name):
+    return [sys.executable, os.path.join(workload_dir, name + ".py")]
+
+
+def compare(results, baseline, threshold):
+    """返回性能回退的描述, 只比较两次都执行了的 y 脚本, cpython 的耗时只作参照"""
+    regressions = []
+    for key, result in results.items():
+        if key.endswith("/cpython") or key not in baseline:
+            continue
+        old = baseline[key]["median"]
+        if result["median"] > old * (1 + threshold):
+            regressions.append(
+                "%s: %.3f s -> %.3f s (+%.0f%%)"
+                % (key, old, result["median"], (result["median"] / old - 1) * 100)
+            )
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(prog="bench-suite")
+    arg_parser.add_argument(
+        "--engine",
+        action="append",
+        choices=engines,
+        help="要测试的引擎, 可以指定多次, 默认为 tree",
+    )
+    arg_parser.add_argument(
+        "--workload", action="append", choices=workloads(), help="默认执行全部"
+    )
+    arg_parser.add_argument("--repeat", type=int, default=5, help="每个脚本执行的次数")
+    arg_parser.add_argument(
+        "--memo-size",
+        type=int,
+        default=0,
+        help="tree 引擎的纯函数缓存大小, 默认关闭, 测量解释执行本身",
+    )
+    arg_parser.add_argument("--save", help="将结果以 JSON 格式写入文件")
+    arg_parser.add_argument("--compare", help="与之前保存的结果比较")
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="耗时的中位数比之前增加超过这个比例时视为性能回退",
+    )
+    args = arg_parser.parse_args()
+    selected_engines = args.engine or ["tree"]
+
+    # 在执行和保存之前读取, --save 与 --compare 可以是同一个文件
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+
+    results = {}
+    print(
+        "%-24s %9s %9s %10s %9s" % ("workload", "median", "p95", "memory", "vs python")
+    )
+    for name in args.workload or workloads():
+        python = measure(python_command(name), args.repeat)
+        results["%s/cpython" % name] = python
+        rows = [("%s/cpython" % name, python)]
+        for engine in selected_engines:
+            result = measure(y_command(engine, name, args.memo_size), args.repeat)
+            results["%s/%s" % (name, engine)] = result
+            rows.append(("%s/%s" % (name, engine), result))
+        for key, result in rows:
+            print(
+                "%-24s %7.3f s %7.3f s %6d KiB %8.1fx"
+                % (
+                    key,
+                    result["median"],
+                    result["p95"],
+                    result["memory"],
+                    result["median"] / python["median"],
+                )
+            )
+
+    if args.save:
+        with open(args.save, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("regression: %s" % regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
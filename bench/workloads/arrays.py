@@ -0,0 +1,9 @@
+a = [0, 0, 0, 0, 0, 0, 0, 0]
+for i in range(50000):
+    a[i % 8] = a[i % 8] + i
+
+b = [1, 2, 3, 4, 5, 6, 7, 8]
+c = a
+for i in range(2000):
+    c = [x + y * 2 for x, y in zip(c, b)]
+print(sum(c), max(c), sum(x * y for x, y in zip(a, b)))
@@ -0,0 +1,10 @@
+# 数组的下标读写和逐元素运算
+var a = [0, 0, 0, 0, 0, 0, 0, 0]
+for i in range(50000):
+    a[i % 8] = a[i % 8] + i
+
+var b = [1, 2, 3, 4, 5, 6, 7, 8]
+var c = a
+for i in range(2000):
+    c = c + b * 2
+print(sum(c), max(c), dot(a, b))
@@ -0,0 +1,12 @@
+def add(x, y):
+    return x + y
+
+
+def inc(x):
+    return add(x, 1)
+
+
+s = 0
+for i in range(50000):
+    s = inc(s) + add(i, len("abc"))
+print(s)
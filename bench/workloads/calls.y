@@ -0,0 +1,11 @@
+# 大量简单的函数调用
+func add(x, y):
+    return x + y
+
+func inc(x):
+    return add(x, 1)
+
+var s = 0
+for (var i = 0; i < 50000; i = i + 1):
+    s = inc(s) + add(i, len("abc"))
+print(s)
@@ -0,0 +1,12 @@
+total = 0
+for i in range(100000):
+    if i % 3 == 0:
+        total = total + i
+    else:
+        total = total - 1
+
+n = 100000
+while n > 0:
+    total = total + n % 7
+    n = n - 1
+print(total)
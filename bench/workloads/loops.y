@@ -0,0 +1,13 @@
+# 紧凑的 for/while 循环
+var total = 0
+for (var i = 0; i < 100000; i = i + 1):
+    if i % 3 == 0:
+        total = total + i
+    else:
+        total = total - 1
+
+var n = 100000
+while n > 0:
+    total = total + n % 7
+    n = n - 1
+print(total)
@@ -0,0 +1,14 @@
+total = 0
+for i in range(3000):
+    a = i % 5
+    if a < 4:
+        b = a + 1
+        while b > 0:
+            c = b * 2
+            if c > 2:
+                d = c - 1
+                for j in range(2):
+                    e = d + j
+                    total = total + e
+            b = b - 1
+print(total)
@@ -0,0 +1,15 @@
+# 多层嵌套的 block, 每层都声明变量
+var total = 0
+for (var i = 0; i < 3000; i = i + 1):
+    var a = i % 5
+    if a < 4:
+        var b = a + 1
+        while b > 0:
+            var c = b * 2
+            if c > 2:
+                var d = c - 1
+                for (var j = 0; j < 2; j = j + 1):
+                    var e = d + j
+                    total = total + e
+            b = b - 1
+print(total)
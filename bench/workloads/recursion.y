@@ -0,0 +1,7 @@
+# 递归调用: 与 fibonacci.y 相同, 规模更小
+func fib(n):
+    if n <= 2:
+        return n
+    return fib(n - 2) + fib(n - 1)
+
+print(fib(20))
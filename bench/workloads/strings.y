@@ -0,0 +1,3 @@
+# 输出字符串
+for i in range(20000):
+    print("hello, world", i, "\t|")
@@ -0,0 +1,88 @@
+"""
+解析结果的磁盘缓存, 类似 python 的 __pycache__.
+脚本 dir/name.y 的缓存保存在 dir/__ycache__/name.yc, 文件头记录
+MAGIC, VERSION 和 源码, 编译选项及内置函数名 的 sha256, 其中任意一项不一致时缓存失效.
+"""
+import gc
+import hashlib
+import os
+import pickle
+import tempfile
+
+from interpreter import builtin_functions
+
+CACHE_DIR = "__ycache__"
+MAGIC = b"\x7fYC\n"
+# AST 节点或者 lexer/parser/resolver 的行为发生变化时需要增加版本号
+VERSION = 10
+
+_header = MAGIC + VERSION.to_bytes(4, "little")
+
+
+def cache_path(filename):
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, CACHE_DIR, os.path.splitext(name)[0] + ".yc")
+
+
+def source_hash(source, options):
+    """
+    options 是影响解析结果的选项, 如优化级别.
+    resolver 的结果 (警告, 尾调用等) 依赖于有哪些内置函数, 内置函数名也计算在内
+    """
+    key = repr((options, sorted(builtin_functions)))
+    return hashlib.sha256(key.encode() + source.encode()).digest()
+
+
+def load(filename, source, options=()):
+    """返回缓存的 (ast, warnings), 缓存不存在或者已经失效时返回 None"""
+    try:
+        with open(cache_path(filename), "rb") as fp:
+            data = fp.read()
+    except OSError:
+        return None
+
+    prefix = _header + source_hash(source, options)
+    if not data.startswith(prefix):
+        return None
+    # 反序列化会一次创建大量对象, 期间关闭 gc 避免反复触发回收
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        result = pickle.loads(data[len(prefix) :])
+    except Exception:
+        # 文件损坏, 当作没有缓存
+        return None
+    finally:
+        if enabled:
+            gc.enable()
+    # AST 在整个运行期间都存在, 移入永久代, 之后的 gc 不再扫描这些对象
+    gc.freeze()
+    return result
+
+
+def store(filename, source, ast, warnings, options=()):
+    """
+    写入缓存. 先写入同一目录下的临时文件再原子地重命名,
+    多个进程同时写入时读到的总是完整的文件; 写入失败时忽略.
+    """
+    try:
+        payload = pickle.dumps((ast, warnings), pickle.HIGHEST_PROTOCOL)
+    except RecursionError:
+        # AST 嵌套太深
+        return
+
+    path = cache_path(filename)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                # 与源文件的权限一致 (mkstemp 创建的文件只有所有者可读写)
+                os.fchmod(fp.fileno(), os.stat(filename).st_mode & 0o666)
+                fp.write(_header + source_hash(source, options) + payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        pass
@@ -0,0 +1,668 @@
+import copy
+import operator
+
+import parser
+from exception import InterpreterError
+from interpreter import And
+from interpreter import Array
+from interpreter import builtin_functions
+from interpreter import false
+from interpreter import function_callers
+from interpreter import is_number
+from interpreter import nil
+from interpreter import Not
+from interpreter import Or
+from interpreter import Range
+from interpreter import Return
+from interpreter import String
+from interpreter import TailCall
+from interpreter import true
+from interpreter import truthy
+from visitor import NodeVisitor
+
+compare_funcs = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+arith_funcs = {
+    parser.Add: operator.add,
+    parser.Sub: operator.sub,
+    parser.Mul: operator.mul,
+    parser.Div: operator.truediv,
+    parser.Mod: operator.mod,
+}
+
+# 编译结果本身就是语句的节点, 其余节点是表达式
+statements = (
+    parser.VarDecl,
+    parser.FuncDecl,
+    parser.If,
+    parser.While,
+    parser.For,
+    parser.RangeFor,
+    parser.Break,
+    parser.Continue,
+    parser.Return,
+    parser.Comment,
+    parser.Block,
+)
+
+
+class Break:
+    pass
+
+
+class Continue:
+    pass
+
+
+class CompiledFunction:
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+        self.nlocals = len(params)
+        # 函数体, 编译完成后才会设置
+        self.body = None
+        # 定义函数时所在的 frame, 顶层的函数为 None
+        self.outer = None
+
+    def bind(self, outer):
+        """执行嵌套函数的声明时, 得到引用外层 frame 的函数"""
+        f_obj = copy.copy(self)
+        f_obj.outer = outer
+        return f_obj
+
+
+def call_function(f_obj, args):
+    # 函数以尾调用返回时在这里继续执行被调用的函数, 不增加 python 栈的深度
+    while True:
+        if not isinstance(f_obj, CompiledFunction):
+            raise InterpreterError("`%s` is not a function" % f_obj)
+        # 多余的实参忽略, 缺少的形参保持未定义
+        frame = args[: len(f_obj.params)]
+        frame.extend([None] * (f_obj.nlocals - len(frame)))
+        frame.append(f_obj.outer)
+        signal = f_obj.body(frame)
+        if signal.__class__ is not TailCall:
+            break
+        f_obj = signal.function
+        args = signal.args
+    if signal.__class__ is Return:
+        return signal.value
+    return nil
+
+
+function_callers[CompiledFunction] = call_function
+
+
+class ClosureCompiler(NodeVisitor):
+    """
+    将 AST 预先编译为嵌套的 python 闭包.
+    表达式编译为 `fn(frame) -> value`, 语句编译为 `fn(frame) -> signal`,
+    signal 为 None 表示顺序执行, 否则为 Break / Continue / Return(value).
+    frame 是当前函数调用的局部变量列表, 最后一个元素是外层函数的 frame,
+    嵌套函数通过它访问外层函数的局部变量.
+    """
+
+    def __init__(self, globals_):
+        self.globals = globals_
+        # 当前函数的块作用域, 每一层是 name -> slot; 主程序顶层为空
+        self.scopes = []
+        # 外层函数的块作用域, 从外到内
+        self.enclosing = []
+        self.function: CompiledFunction
+        self.in_function = False
+
+    def compile(self, program):
+        return self.visit(program)
+
+    def resolve(self, name):
+        """返回 (外层函数的层数, slot), 全局变量返回 None"""
+        for depth, scopes in enumerate([self.scopes] + self.enclosing[::-1]):
+            for scope in reversed(scopes):
+                if name in scope:
+                    return depth, scope[name]
+        return None
+
+    def declare(self, name):
+        scope = self.scopes[-1]
+        if name not in scope:
+            scope[name] = self.function.nlocals
+            self.function.nlocals += 1
+        return scope[name]
+
+    def load(self, name):
+        location = self.resolve(name)
+        if location is not None and location[0] == 0:
+            slot = location[1]
+
+            def load_local(frame):
+                value = frame[slot]
+                if value is None:
+                    raise InterpreterError("Identifier `%s` is not defined" % name)
+                return value
+
+            return load_local
+
+        if location is not None:
+            depth, slot = location
+
+            def load_outer(frame):
+                for _ in range(depth):
+                    frame = frame[-1]
+                value = frame[slot]
+                if value is None:
+                    raise InterpreterError("Identifier `%s` is not defined" % name)
+                return value
+
+            return load_outer
+
+        globals_ = self.globals
+
+        def load_global(frame):
+            try:
+                return globals_[name]
+            except KeyError:
+                raise InterpreterError("Identifier `%s` is not defined" % name)
+
+        return load_global
+
+    def define(self, name, expr):
+        """在当前作用域声明变量, 返回赋值语句"""
+        if self.scopes:
+            slot = self.declare(name)
+
+            def define_local(frame):
+                frame[slot] = expr(frame)
+
+            return define_local
+
+        globals_ = self.globals
+
+        def define_global(frame):
+            globals_[name] = expr(frame)
+
+        return define_global
+
+    def store(self, name, expr):
+        location = self.resolve(name)
+        if location is not None and location[0] == 0:
+            slot = location[1]
+
+            def store_local(frame):
+                frame[slot] = expr(frame)
+
+            return store_local
+
+        if location is not None:
+            depth, slot = location
+
+            def store_outer(frame):
+                value = expr(frame)
+                for _ in range(depth):
+                    frame = frame[-1]
+                frame[slot] = value
+
+            return store_outer
+
+        globals_ = self.globals
+
+        def store_global(frame):
+            if name not in globals_:
+                raise InterpreterError("Assign to an unknown variable `%s`" % name)
+            globals_[name] = expr(frame)
+
+        return store_global
+
+    def condition(self, node):
+        """条件表达式, 返回值为 python 的 bool"""
+        cond = self.visit(node)
+        if isinstance(node, parser.Compare):
+            # 比较运算的结果已经是 bool
+            return cond
+
+        def test(frame):
+            return truthy(cond(frame))
+
+        return test
+
+    def block(self, declarations):
+        stmts = tuple(self.statement(decl) for decl in declarations)
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def block(frame):
+            for stmt in stmts:
+                signal = stmt(frame)
+                if signal is not None:
+                    return signal
+
+        return block
+
+    def statement(self, node):
+        if isinstance(node, parser.Assign):
+            return self.assign(node)
+        stmt = self.visit(node)
+        if isinstance(node, statements):
+            return stmt
+
+        # 表达式语句, 丢弃结果
+        def expr_stmt(frame):
+            stmt(frame)
+
+        return expr_stmt
+
+    def visit_Unknown(self, node):
+        raise InterpreterError("Cannot compile `%s`" % type(node).__name__)
+
+    def visit_Program(self, node):
+        self.function = CompiledFunction("main", [])
+        body = self.block(node.declarations)
+        function = self.function
+
+        def program():
+            # 主程序没有外层的 frame
+            body([None] * function.nlocals + [None])
+
+        return program
+
+    def visit_Block(self, node):
+        if node.captured:
+            return self.block_frame(node)
+        return self.body(node)
+
+    def body(self, node):
+        """在当前 frame 中执行的 block"""
+        self.scopes.append({})
+        body = self.block(node.declarations)
+        self.scopes.pop()
+        return body
+
+    def block_frame(self, node):
+        """
+        其中的变量被嵌套函数引用的 block, 每次执行都使用新的 frame,
+        循环中每次迭代创建的闭包引用各自的变量
+        """
+        outer = (self.function, self.scopes)
+        self.enclosing.append(self.scopes)
+        # 只用于给 block 中的变量分配 slot
+        self.function = CompiledFunction("<block>", [])
+        self.scopes = [{}]
+        body = self.block(node.declarations)
+        layout = self.function
+        self.function, self.scopes = outer
+        self.enclosing.pop()
+
+        def block_frame(frame):
+            return body([None] * layout.nlocals + [frame])
+
+        return block_frame
+
+    def visit_Comment(self, node):
+        def comment(frame):
+            pass
+
+        return comment
+
+    def visit_VarDecl(self, node):
+        if node.expr_node:
+            expr = self.visit(node.expr_node)
+        else:
+            expr = self.constant(nil)
+        return self.define(node.var.token.value, expr)
+
+    def visit_FuncDecl(self, node):
+        f_name = node.func.token.value
+        f_params = [p.value for p in node.params]
+        f_obj = CompiledFunction(f_name, f_params)
+
+        if self.scopes:
+            # 先声明函数名, 函数体中可以递归调用
+            self.declare(f_name)
+
+        outer = (self.function, self.scopes, self.in_function)
+        self.enclosing.append(self.scopes)
+        self.function = f_obj
+        self.scopes = [{p: slot for slot, p in enumerate(f_params)}]
+        self.in_function = True
+        # 函数体每次调用都使用新的 frame
+        f_obj.body = self.body(node.block)
+        self.function, self.scopes, self.in_function = outer
+        self.enclosing.pop()
+
+        if not self.scopes:
+            return self.define(f_name, self.constant(f_obj))
+
+        # 在函数或者块中声明, 每次执行时绑定当前的 frame
+        def closure(frame):
+            return f_obj.bind(frame)
+
+        return self.define(f_name, closure)
+
+    def visit_Return(self, node):
+        if not self.in_function:
+            raise InterpreterError("`return` outside function")
+        if node.tail_call:
+            call = node.expr_node
+            func = self.visit(call.func)
+            args = tuple(self.visit(arg) for arg in call.arguments)
+
+            def tail_call(frame):
+                return TailCall(func(frame), [arg(frame) for arg in args])
+
+            return tail_call
+
+        expr = self.visit(node.expr_node)
+
+        def return_(frame):
+            return Return(expr(frame))
+
+        return return_
+
+    def visit_If(self, node):
+        parts = [node.if_part] + node.elif_parts
+        conds = tuple(self.condition(part.condition) for part in parts)
+        blocks = tuple(self.visit(part.block) for part in parts)
+        else_block = None
+        if node.else_part:
+            else_block = self.visit(node.else_part.block)
+
+        if len(parts) == 1:
+            cond, block = conds[0], blocks[0]
+
+            def if_(frame):
+                if cond(frame):
+                    return block(frame)
+                if else_block is not None:
+                    return else_block(frame)
+
+            return if_
+
+        branches = tuple(zip(conds, blocks))
+
+        def if_elif(frame):
+            for cond, block in branches:
+                if cond(frame):
+                    return block(frame)
+            if else_block is not None:
+                return else_block(frame)
+
+        return if_elif
+
+    def visit_While(self, node):
+        cond = self.condition(node.condition)
+        block = self.visit(node.block)
+
+        def while_(frame):
+            while cond(frame):
+                signal = block(frame)
+                if signal is not None:
+                    if signal is Break:
+                        break
+                    if signal is not Continue:
+                        return signal
+
+        return while_
+
+    def visit_For(self, node):
+        init = self.statement(node.init)
+        cond = self.condition(node.cond)
+        incr = self.statement(node.incr)
+        block = self.visit(node.block)
+
+        def for_(frame):
+            init(frame)
+            while cond(frame):
+                signal = block(frame)
+                if signal is not None:
+                    if signal is Break:
+                        break
+                    if signal is not Continue:
+                        return signal
+                incr(frame)
+
+        return for_
+
+    def visit_RangeFor(self, node):
+        var_name = node.var.token.value
+        iterable = self.visit(node.iterable)
+
+        if self.scopes:
+            # 循环变量只在循环内可见
+            self.scopes.append({})
+            slot = self.declare(var_name)
+            block = self.visit(node.block)
+            self.scopes.pop()
+
+            def range_for(frame):
+                for value in iterable(frame):
+                    frame[slot] = value
+                    signal = block(frame)
+                    if signal is not None:
+                        if signal is Break:
+                            break
+                        if signal is not Continue:
+                            return signal
+
+            return range_for
+
+        block = self.visit(node.block)
+        globals_ = self.globals
+
+        def range_for_global(frame):
+            try:
+                for value in iterable(frame):
+                    globals_[var_name] = value
+                    signal = block(frame)
+                    if signal is not None:
+                        if signal is Break:
+                            break
+                        if signal is not Continue:
+                            return signal
+            finally:
+                globals_.pop(var_name, None)
+
+        return range_for_global
+
+    def visit_Break(self, node):
+        def break_(frame):
+            return Break
+
+        return break_
+
+    def visit_Continue(self, node):
+        def continue_(frame):
+            return Continue
+
+        return continue_
+
+    def assign(self, node):
+        expr = self.visit(node.expr)
+        if not isinstance(node.left, parser.ArrayAccess):
+            return self.store(node.left.token.value, expr)
+
+        array = self.load(node.left.node.token.value)
+        index = self.visit(node.left.index)
+
+        def store_subscr(frame):
+            value = expr(frame)
+            arr = array(frame)
+            idx = index(frame)
+            assert isinstance(arr, Array)
+            assert is_number(idx)
+            assert idx < len(arr.elements)
+            arr.store(idx, value)
+
+        return store_subscr
+
+    def visit_Assign(self, node):
+        # 作为表达式使用时, 与 Interpreter 一致返回 None
+        assign = self.assign(node)
+
+        def assign_expr(frame):
+            assign(frame)
+
+        return assign_expr
+
+    def visit_FunctionCall(self, node):
+        args = tuple(self.visit(arg) for arg in node.arguments)
+
+        if isinstance(node.func, parser.Identifier):
+            if node.builtin:
+                native = builtin_functions[node.func.token.value]
+
+                def call_builtin(frame):
+                    return native([arg(frame) for arg in args])
+
+                return call_builtin
+
+        func = self.visit(node.func)
+
+        def call(frame):
+            return call_function(func(frame), [arg(frame) for arg in args])
+
+        return call
+
+    def visit_Expr(self, node):
+        return self.visit(node.expr_node)
+
+    def visit_Identifier(self, node):
+        return self.load(node.token.value)
+
+    def constant(self, value):
+        def constant(frame):
+            return value
+
+        return constant
+
+    def visit_Number(self, node):
+        return self.constant(node.value)
+
+    def visit_String(self, node):
+        return self.constant(String(node.token.value))
+
+    def visit__True(self, node):
+        return self.constant(true)
+
+    def visit__False(self, node):
+        return self.constant(false)
+
+    def visit_Nil(self, node):
+        return self.constant(nil)
+
+    def visit_Array(self, node):
+        elements = tuple(self.visit(elem) for elem in node.elements)
+
+        def array(frame):
+            return Array([elem(frame) for elem in elements])
+
+        return array
+
+    def visit_ArrayAccess(self, node):
+        array = self.visit(node.node)
+        index = self.visit(node.index)
+
+        def array_access(frame):
+            arr = array(frame)
+            idx = index(frame)
+            assert isinstance(arr, (Array, Range))
+            assert is_number(idx)
+            assert idx < len(arr.elements)
+            return arr.elements[idx]
+
+        return array_access
+
+    def arith(self, node):
+        op = arith_funcs[type(node)]
+        left = self.visit(node.left)
+        if isinstance(node.right, parser.Number):
+            # 右操作数是常量 (如 `n - 1`), 省去一次函数调用
+            const = node.right.value
+
+            def arith_const(frame):
+                return op(left(frame), const)
+
+            return arith_const
+
+        right = self.visit(node.right)
+
+        def arith(frame):
+            return op(left(frame), right(frame))
+
+        return arith
+
+    visit_Add = arith
+    visit_Sub = arith
+    visit_Mul = arith
+    visit_Div = arith
+    visit_Mod = arith
+
+    def visit_Compare(self, node):
+        if node.op_type not in compare_funcs:
+            raise InterpreterError("Unknown Compare op_type `%s`" % node.op_type)
+        op = compare_funcs[node.op_type]
+        left = self.visit(node.left)
+        if isinstance(node.right, parser.Number):
+            const = node.right.value
+
+            def compare_const(frame):
+                return op(left(frame), const)
+
+            return compare_const
+
+        right = self.visit(node.right)
+
+        def compare(frame):
+            return op(left(frame), right(frame))
+
+        return compare
+
+    def visit_And(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+
+        def and_(frame):
+            return And(left(frame), right(frame))
+
+        return and_
+
+    def visit_Or(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+
+        def or_(frame):
+            return Or(left(frame), right(frame))
+
+        return or_
+
+    def visit_Not(self, node):
+        value = self.visit(node.node)
+
+        def not_(frame):
+            return Not(value(frame))
+
+        return not_
+
+    def visit_Negative(self, node):
+        value = self.visit(node.node)
+
+        def negative(frame):
+            return -value(frame)
+
+        return negative
+
+
+class ClosureInterpreter:
+    """与 Interpreter 接口一致, 先把 AST 编译为闭包再执行"""
+
+    def __init__(self):
+        self.globals = {}
+
+    def run(self, ast_tree):
+        program = ClosureCompiler(self.globals).compile(ast_tree)
+        program()
@@ -0,0 +1,571 @@
+import copy
+import operator
+
+import parser
+from exception import InterpreterError
+from interpreter import builtin_functions
+from interpreter import false
+from interpreter import nil
+from interpreter import String
+from interpreter import true
+from visitor import NodeVisitor
+
+# opcodes
+LOAD_CONST = 0
+LOAD_FAST = 1
+STORE_FAST = 2
+LOAD_GLOBAL = 3
+STORE_GLOBAL = 4
+DEFINE_GLOBAL = 5
+DELETE_GLOBAL = 6
+POP_TOP = 7
+BINARY_ADD = 8
+BINARY_SUB = 9
+BINARY_MUL = 10
+BINARY_DIV = 11
+BINARY_MOD = 12
+COMPARE_OP = 13
+BUILD_AND = 14
+BUILD_OR = 15
+UNARY_NOT = 16
+UNARY_NEGATIVE = 17
+JUMP = 18
+POP_JUMP_IF_FALSE = 19
+GET_ITER = 20
+FOR_ITER = 21
+BUILD_ARRAY = 22
+BINARY_SUBSCR = 23
+STORE_SUBSCR = 24
+CALL_BUILTIN = 25
+CALL_FUNCTION = 26
+RETURN_VALUE = 27
+TAIL_CALL = 28
+LOAD_DEREF = 29
+STORE_DEREF = 30
+MAKE_CLOSURE = 31
+ENTER_BLOCK = 32
+LEAVE_BLOCK = 33
+
+opnames = {
+    value: name
+    for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
+
+# COMPARE_OP 的参数是这个元组的下标
+compare_ops = ("<", "<=", ">", ">=", "==", "!=")
+compare_funcs = (
+    operator.lt,
+    operator.le,
+    operator.gt,
+    operator.ge,
+    operator.eq,
+    operator.ne,
+)
+
+# 不会在栈上留下值的节点
+statements = (
+    parser.VarDecl,
+    parser.FuncDecl,
+    parser.If,
+    parser.While,
+    parser.For,
+    parser.RangeFor,
+    parser.Break,
+    parser.Continue,
+    parser.Return,
+    parser.Comment,
+    parser.Block,
+)
+
+
+class CodeObject:
+    """编译后的函数(或者整个程序)"""
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+        # 指令列表, 每条指令是 (opcode, arg)
+        self.code = []
+        # 常量池
+        self.consts = []
+        self.const_index = {}
+        # 局部变量槽位对应的变量名, 前 len(params) 个是形参
+        self.varnames = list(params)
+        # 定义函数时所在的调用帧的局部变量, 顶层的函数为 None
+        self.outer = None
+
+    def bind(self, outer):
+        """执行嵌套函数的声明时 (MAKE_CLOSURE), 得到引用外层局部变量的函数"""
+        code_obj = copy.copy(self)
+        code_obj.outer = outer
+        return code_obj
+
+    @property
+    def nlocals(self):
+        return len(self.varnames)
+
+    def __str__(self):
+        return "<code %s>" % self.name
+
+
+class Loop:
+    def __init__(self, is_range_for, block_frames):
+        self.is_range_for = is_range_for
+        # 进入循环时的 block 调用帧层数, break / continue 需要退出其中新建的
+        self.block_frames = block_frames
+        # 需要回填跳转地址的 break / continue 指令
+        self.breaks = []
+        self.continues = []
+
+
+class Compiler(NodeVisitor):
+    """将 parser 生成的 AST 编译为 vm.VM 执行的字节码"""
+
+    def __init__(self):
+        self.code_obj: CodeObject
+        # 当前 CodeObject 的块作用域, 每一层是 name -> slot;
+        # 主程序顶层为空, 此时声明的变量都是全局变量
+        self.scopes = []
+        # 外层函数 (以及外层的 block 调用帧) 的块作用域, 从外到内
+        self.enclosing = []
+        # 当前调用帧的局部变量名, 函数的调用帧即 code_obj.varnames
+        self.varnames = []
+        # 当前函数中进入的 block 调用帧的层数 (ENTER_BLOCK)
+        self.block_frames = 0
+        self.loops = []
+        self.in_function = False
+
+    def compile(self, program):
+        self.visit(program)
+        return self.code_obj
+
+    def emit(self, op, arg=None):
+        self.code_obj.code.append((op, arg))
+        return len(self.code_obj.code) - 1
+
+    def patch(self, index, target=None):
+        """回填跳转地址, 默认跳转到下一条将要生成的指令"""
+        if target is None:
+            target = len(self.code_obj.code)
+        op, _ = self.code_obj.code[index]
+        self.code_obj.code[index] = (op, target)
+
+    def const(self, value, key=None):
+        """将常量加入常量池并返回下标, 相同 key 的常量只保存一份"""
+        if key is None:
+            key = id(value)
+        code_obj = self.code_obj
+        if key not in code_obj.const_index:
+            code_obj.const_index[key] = len(code_obj.consts)
+            code_obj.consts.append(value)
+        return code_obj.const_index[key]
+
+    def resolve(self, name):
+        """返回 (外层函数的层数, 槽位), 全局变量返回 None"""
+        for depth, scopes in enumerate([self.scopes] + self.enclosing[::-1]):
+            for scope in reversed(scopes):
+                if name in scope:
+                    return depth, scope[name]
+        return None
+
+    def declare(self, name):
+        scope = self.scopes[-1]
+        if name not in scope:
+            scope[name] = len(self.varnames)
+            self.varnames.append(name)
+        return scope[name]
+
+    def load(self, name):
+        location = self.resolve(name)
+        if location is None:
+            self.emit(LOAD_GLOBAL, name)
+        elif location[0] == 0 and not self.block_frames:
+            self.emit(LOAD_FAST, location[1])
+        else:
+            # block 调用帧中的变量名不在 code_obj.varnames 中, 同样使用 *_DEREF
+            self.emit(LOAD_DEREF, location + (name,))
+
+    def store(self, name):
+        """变量赋值, 变量必须已经存在"""
+        location = self.resolve(name)
+        if location is None:
+            self.emit(STORE_GLOBAL, name)
+        elif location[0] == 0 and not self.block_frames:
+            self.emit(STORE_FAST, location[1])
+        else:
+            self.emit(STORE_DEREF, location + (name,))
+
+    def define(self, name):
+        """在当前作用域声明变量并赋值"""
+        if self.block_frames:
+            self.emit(STORE_DEREF, (0, self.declare(name), name))
+        elif self.scopes:
+            self.emit(STORE_FAST, self.declare(name))
+        else:
+            self.emit(DEFINE_GLOBAL, name)
+
+    def statement(self, node):
+        if isinstance(node, parser.Assign):
+            self.assign(node)
+        elif isinstance(node, statements):
+            self.visit(node)
+        else:
+            self.visit(node)
+            self.emit(POP_TOP)
+
+    def visit_Unknown(self, node):
+        raise InterpreterError("Cannot compile `%s`" % type(node).__name__)
+
+    def visit_Program(self, node):
+        self.code_obj = CodeObject("main", [])
+        self.varnames = self.code_obj.varnames
+        for declaration in node.declarations:
+            self.statement(declaration)
+        self.emit(LOAD_CONST, self.const(nil))
+        self.emit(RETURN_VALUE)
+
+    def visit_Block(self, node):
+        if node.captured:
+            self.block_frame(node)
+        else:
+            self.body(node)
+
+    def body(self, node):
+        """在当前调用帧中执行的 block"""
+        self.scopes.append({})
+        for declaration in node.declarations:
+            self.statement(declaration)
+        self.scopes.pop()
+
+    def block_frame(self, node):
+        """
+        其中的变量被嵌套函数引用的 block, 每次执行都使用新的调用帧 (ENTER_BLOCK),
+        循环中每次迭代创建的闭包引用各自的变量
+        """
+        outer = (self.scopes, self.varnames)
+        self.enclosing.append(self.scopes)
+        self.scopes = [{}]
+        self.varnames = []
+        self.block_frames += 1
+        self.emit(ENTER_BLOCK, self.varnames)
+        for declaration in node.declarations:
+            self.statement(declaration)
+        self.emit(LEAVE_BLOCK)
+        self.block_frames -= 1
+        self.scopes, self.varnames = outer
+        self.enclosing.pop()
+
+    def leave_blocks(self, loop):
+        """跳出循环之前退出循环中新建的 block 调用帧"""
+        for _ in range(self.block_frames - loop.block_frames):
+            self.emit(LEAVE_BLOCK)
+
+    def visit_Comment(self, node):
+        pass
+
+    def visit_VarDecl(self, node):
+        if node.expr_node:
+            self.visit(node.expr_node)
+        else:
+            self.emit(LOAD_CONST, self.const(nil))
+        self.define(node.var.token.value)
+
+    def visit_FuncDecl(self, node):
+        f_name = node.func.token.value
+        f_params = [p.value for p in node.params]
+
+        if self.scopes:
+            # 先声明函数名, 函数体中可以递归调用
+            self.declare(f_name)
+
+        outer = (
+            self.code_obj,
+            self.scopes,
+            self.varnames,
+            self.block_frames,
+            self.loops,
+            self.in_function,
+        )
+        self.enclosing.append(self.scopes)
+        self.code_obj = CodeObject(f_name, f_params)
+        self.scopes = [{p: slot for slot, p in enumerate(f_params)}]
+        self.varnames = self.code_obj.varnames
+        self.block_frames = 0
+        self.loops = []
+        self.in_function = True
+
+        # 函数体每次调用都使用新的调用帧
+        self.body(node.block)
+        self.emit(LOAD_CONST, self.const(nil))
+        self.emit(RETURN_VALUE)
+
+        f_code = self.code_obj
+        (
+            self.code_obj,
+            self.scopes,
+            self.varnames,
+            self.block_frames,
+            self.loops,
+            self.in_function,
+        ) = outer
+        self.enclosing.pop()
+        self.emit(LOAD_CONST, self.const(f_code))
+        if self.scopes:
+            # 在函数或者块中声明, 每次执行时绑定当前调用帧的局部变量
+            self.emit(MAKE_CLOSURE)
+        self.define(f_name)
+
+    def visit_Return(self, node):
+        if not self.in_function:
+            raise InterpreterError("`return` outside function")
+        if node.tail_call:
+            # 被调用的函数替换当前的调用帧, 返回值直接返回给调用者
+            call = node.expr_node
+            self.visit(call.func)
+            for arg in call.arguments:
+                self.visit(arg)
+            self.emit(TAIL_CALL, len(call.arguments))
+            return
+        self.visit(node.expr_node)
+        self.emit(RETURN_VALUE)
+
+    def visit_If(self, node):
+        end_jumps = []
+        parts = [node.if_part] + node.elif_parts
+        for part in parts:
+            self.visit(part.condition)
+            next_part = self.emit(POP_JUMP_IF_FALSE)
+            self.visit(part.block)
+            end_jumps.append(self.emit(JUMP))
+            self.patch(next_part)
+        if node.else_part:
+            self.visit(node.else_part.block)
+        for index in end_jumps:
+            self.patch(index)
+
+    def visit_While(self, node):
+        loop = Loop(is_range_for=False, block_frames=self.block_frames)
+        self.loops.append(loop)
+        start = len(self.code_obj.code)
+        self.visit(node.condition)
+        exit_jump = self.emit(POP_JUMP_IF_FALSE)
+        self.visit(node.block)
+        self.emit(JUMP, start)
+        self.loops.pop()
+
+        self.patch(exit_jump)
+        for index in loop.continues:
+            self.patch(index, start)
+        for index in loop.breaks:
+            self.patch(index)
+
+    def visit_For(self, node):
+        self.statement(node.init)
+        loop = Loop(is_range_for=False, block_frames=self.block_frames)
+        self.loops.append(loop)
+        start = len(self.code_obj.code)
+        self.visit(node.cond)
+        exit_jump = self.emit(POP_JUMP_IF_FALSE)
+        self.visit(node.block)
+        incr = len(self.code_obj.code)
+        self.statement(node.incr)
+        self.emit(JUMP, start)
+        self.loops.pop()
+
+        self.patch(exit_jump)
+        for index in loop.continues:
+            self.patch(index, incr)
+        for index in loop.breaks:
+            self.patch(index)
+
+    def visit_RangeFor(self, node):
+        var_name = node.var.token.value
+        self.visit(node.iterable)
+        self.emit(GET_ITER)
+
+        # 循环变量只在循环内可见
+        if self.scopes:
+            self.scopes.append({})
+        loop = Loop(is_range_for=True, block_frames=self.block_frames)
+        self.loops.append(loop)
+        start = self.emit(FOR_ITER)
+        self.define(var_name)
+        self.visit(node.block)
+        self.emit(JUMP, start)
+        self.loops.pop()
+        if self.scopes:
+            self.scopes.pop()
+
+        self.patch(start)
+        for index in loop.continues:
+            self.patch(index, start)
+        for index in loop.breaks:
+            self.patch(index)
+        if not self.scopes:
+            self.emit(DELETE_GLOBAL, var_name)
+
+    def visit_Break(self, node):
+        if not self.loops:
+            raise InterpreterError("`break` outside loop")
+        loop = self.loops[-1]
+        if loop.is_range_for:
+            # 弹出迭代器
+            self.emit(POP_TOP)
+        self.leave_blocks(loop)
+        loop.breaks.append(self.emit(JUMP))
+
+    def visit_Continue(self, node):
+        if not self.loops:
+            raise InterpreterError("`continue` outside loop")
+        self.leave_blocks(self.loops[-1])
+        self.loops[-1].continues.append(self.emit(JUMP))
+
+    def assign(self, node):
+        if isinstance(node.left, parser.ArrayAccess):
+            self.load(node.left.node.token.value)
+            self.visit(node.left.index)
+            self.visit(node.expr)
+            self.emit(STORE_SUBSCR)
+            return
+
+        self.visit(node.expr)
+        self.store(node.left.token.value)
+
+    def visit_Assign(self, node):
+        # 作为表达式使用时, 与 Interpreter 一致返回 None
+        self.assign(node)
+        self.emit(LOAD_CONST, self.const(None))
+
+    def visit_FunctionCall(self, node):
+        if isinstance(node.func, parser.Identifier):
+            f_name = node.func.token.value
+            if node.builtin:
+                for arg in node.arguments:
+                    self.visit(arg)
+                self.emit(
+                    CALL_BUILTIN, (builtin_functions[f_name], len(node.arguments))
+                )
+                return
+
+        self.visit(node.func)
+        for arg in node.arguments:
+            self.visit(arg)
+        self.emit(CALL_FUNCTION, len(node.arguments))
+
+    def visit_Expr(self, node):
+        self.visit(node.expr_node)
+
+    def visit_Identifier(self, node):
+        self.load(node.token.value)
+
+    def visit_Number(self, node):
+        value = node.value
+        # 1 和 1.0 是不同的常量
+        self.emit(LOAD_CONST, self.const(value, (type(value), value)))
+
+    def visit_String(self, node):
+        value = node.token.value
+        self.emit(LOAD_CONST, self.const(String(value), (String, value)))
+
+    def visit__True(self, node):
+        self.emit(LOAD_CONST, self.const(true))
+
+    def visit__False(self, node):
+        self.emit(LOAD_CONST, self.const(false))
+
+    def visit_Nil(self, node):
+        self.emit(LOAD_CONST, self.const(nil))
+
+    def visit_Array(self, node):
+        for elem in node.elements:
+            self.visit(elem)
+        self.emit(BUILD_ARRAY, len(node.elements))
+
+    def visit_ArrayAccess(self, node):
+        self.visit(node.node)
+        self.visit(node.index)
+        self.emit(BINARY_SUBSCR)
+
+    def binary(self, node, op):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.emit(op)
+
+    def visit_Add(self, node):
+        self.binary(node, BINARY_ADD)
+
+    def visit_Sub(self, node):
+        self.binary(node, BINARY_SUB)
+
+    def visit_Mul(self, node):
+        self.binary(node, BINARY_MUL)
+
+    def visit_Div(self, node):
+        self.binary(node, BINARY_DIV)
+
+    def visit_Mod(self, node):
+        self.binary(node, BINARY_MOD)
+
+    def visit_Compare(self, node):
+        if node.op_type not in compare_ops:
+            raise InterpreterError("Unknown Compare op_type `%s`" % node.op_type)
+        self.visit(node.left)
+        self.visit(node.right)
+        self.emit(COMPARE_OP, compare_ops.index(node.op_type))
+
+    def visit_And(self, node):
+        self.binary(node, BUILD_AND)
+
+    def visit_Or(self, node):
+        self.binary(node, BUILD_OR)
+
+    def visit_Not(self, node):
+        self.visit(node.node)
+        self.emit(UNARY_NOT)
+
+    def visit_Negative(self, node):
+        self.visit(node.node)
+        self.emit(UNARY_NEGATIVE)
+
+
+def disassemble(code_obj: CodeObject):
+    """返回字节码的文本形式, 嵌套的函数会递归输出"""
+    lines = [
+        "Disassembly of %s (params=%s, locals=%s):"
+        % (code_obj.name, code_obj.params, code_obj.varnames)
+    ]
+    jump_targets = {
+        arg for op, arg in code_obj.code if op in (JUMP, POP_JUMP_IF_FALSE, FOR_ITER)
+    }
+    nested = []
+    for pc, (op, arg) in enumerate(code_obj.code):
+        if op == LOAD_CONST:
+            value = code_obj.consts[arg]
+            if isinstance(value, CodeObject):
+                nested.append(value)
+            detail = "%d (%s)" % (arg, value)
+        elif op in (LOAD_FAST, STORE_FAST):
+            detail = "%d (%s)" % (arg, code_obj.varnames[arg])
+        elif op == ENTER_BLOCK:
+            detail = "%d (%s)" % (len(arg), ", ".join(arg))
+        elif op in (LOAD_DEREF, STORE_DEREF):
+            depth, slot, name = arg
+            detail = "%d %d (%s)" % (depth, slot, name)
+        elif op == COMPARE_OP:
+            detail = "%d (%s)" % (arg, compare_ops[arg])
+        elif op == CALL_BUILTIN:
+            func, argc = arg
+            detail = "%d (%s)" % (argc, func.__name__)
+        elif arg is None:
+            detail = ""
+        else:
+            detail = str(arg)
+        marker = ">>" if pc in jump_targets else "  "
+        line = "  %s %4d %-18s %s" % (marker, pc, opnames[op], detail)
+        lines.append(line.rstrip())
+
+    for code in nested:
+        lines.append("")
+        lines.append(disassemble(code))
+    return "\n".join(lines)
@@ -1,25 +1,213 @@
 import codecs
+import itertools
+import operator
+import statistics
+import time
+from array import array
+from collections import OrderedDict
 from enum import Enum
-from typing import Optional
 from typing import Union
 
+import vector
 from exception import InterpreterError
 from util import Stack
 from visitor import NodeVisitor
 
 debug = False
 
+# 全局环境的版本号, 作为内联缓存的时间戳. 多个 Interpreter 共享同一个计数器,
+# 同一个 AST 被另一个 Interpreter 执行时不会用到之前的缓存
+versions = itertools.count()
+
 
 class Function:
-    def __init__(self, f_name, f_params, f_block):
+    __slots__ = ("name", "params", "block", "closure", "pure", "memo")
+
+    def __init__(self, f_name, f_params, f_block, closure, pure=False):
         self.name = f_name
         self.params = f_params
         self.block = f_block
+        # 定义函数时的活动记录, 函数体中的非局部变量从这里开始查找
+        self.closure = closure
+        # 纯函数 (purity.Purity 分析得到, 或者 memoize() 指定) 的结果可以缓存
+        self.pure = pure
+        self.memo = None
+
+
+class Memo:
+    """函数调用结果的 LRU 缓存"""
+
+    __slots__ = ("name", "size", "results", "hits", "misses")
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """返回缓存的结果, 没有缓存时返回 None"""
+        results = self.results
+        try:
+            result = results[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        results.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        results = self.results
+        results[key] = result
+        if len(results) > self.size:
+            results.popitem(last=False)
 
+    def __str__(self):
+        return "%-20s hits=%d misses=%d size=%d" % (
+            self.name,
+            self.hits,
+            self.misses,
+            len(self.results),
+        )
+
+
+def memo_key(args):
+    """实参组成的缓存键, 实参不全是数字或字符串时返回 None"""
+    key = []
+    for arg in args:
+        cls = arg.__class__
+        if cls is int:
+            key.append(arg)
+        elif cls is float:
+            # 0.0 == -0.0, 但输出不同
+            if arg == 0:
+                return None
+            # 与相等的 int 区分, 如 1 和 1.0 的输出不同
+            key.append((float, arg))
+        elif cls is String:
+            key.append((String, arg.value))
+        else:
+            return None
+    return tuple(key)
+
+
+def elementwise(op):
+    def method(self, other):
+        if isinstance(other, Sequence):
+            other = other.elements
+        return Array(vector.elementwise(op, self.elements, other))
+
+    return method
+
+
+def reflected(op):
+    def method(self, other):
+        return Array(vector.elementwise(op, other, self.elements))
+
+    return method
+
+
+class Sequence:
+    """
+    Array 和 Range 的逐元素运算: 两个数组之间, 或者数组和标量之间
+    的算术运算和比较, 结果是新的 Array
+    """
+
+    __slots__ = ()
+
+    __add__ = elementwise(operator.add)
+    __radd__ = reflected(operator.add)
+    __sub__ = elementwise(operator.sub)
+    __rsub__ = reflected(operator.sub)
+    __mul__ = elementwise(operator.mul)
+    __rmul__ = reflected(operator.mul)
+    __truediv__ = elementwise(operator.truediv)
+    __rtruediv__ = reflected(operator.truediv)
+    __mod__ = elementwise(operator.mod)
+    __rmod__ = reflected(operator.mod)
+    __lt__ = elementwise(operator.lt)
+    __le__ = elementwise(operator.le)
+    __gt__ = elementwise(operator.gt)
+    __ge__ = elementwise(operator.ge)
+    __eq__ = elementwise(operator.eq)
+    __ne__ = elementwise(operator.ne)
+
+    def __neg__(self):
+        return Array(vector.negative(self.elements))
+
+
+# 数字数组使用 array 模块保存, 每个元素占 8 字节, 不需要为每个元素保存一个 python 对象
+typecodes = {int: "q", float: "d"}
+element_types = {"q": int, "d": float}
+
+
+def pack(elements):
+    """元素都是 int 或者都是 float 时转换为 array, 否则返回原来的 list"""
+    if not elements:
+        return elements
+    cls = elements[0].__class__
+    typecode = typecodes.get(cls)
+    if typecode is None:
+        return elements
+    for elem in elements:
+        # int 和 float 混合时不转换, 否则 int 会被输出为浮点数
+        if elem.__class__ is not cls:
+            return elements
+    try:
+        return array(typecode, elements)
+    except OverflowError:
+        # 超出 64 位整数的范围
+        return elements
+
+
+class Array(Sequence):
+    """
+    elements 是 list 或者 array.array. 元素类型相同的数字数组自动使用 array,
+    写入其他类型的值时转换为 list; 读取和 len() 两者都一样
+    """
+
+    __slots__ = ("elements",)
 
-class Array:
     def __init__(self, elements):
-        self.elements = elements
+        self.elements = pack(elements)
+
+    def store(self, index, value):
+        elements = self.elements
+        if elements.__class__ is not list:
+            if value.__class__ is element_types[elements.typecode]:
+                try:
+                    elements[index] = value
+                    return
+                except OverflowError:
+                    pass
+            elements = self.elements = elements.tolist()
+        elements[index] = value
+
+    def __str__(self):
+        return "[" + ",".join([str(e) for e in self.elements]) + "]"
+
+    def __bool__(self):
+        return len(self.elements) == 0
+
+
+class Range(Sequence):
+    """
+    range() 的返回值. 元素按需计算, 可以多次迭代;
+    elements 与 Array.elements 一样支持 len() 和下标访问, 时间复杂度为 O(1)
+    """
+
+    __slots__ = ("elements",)
+
+    def __init__(self, start, stop, step=1):
+        self.elements = range(start, stop, step)
+
+    def __iter__(self):
+        return iter(self.elements)
+
+    def __len__(self):
+        return len(self.elements)
 
     def __str__(self):
         return "[" + ",".join([str(e) for e in self.elements]) + "]"
@@ -28,7 +216,73 @@ class Array:
         return len(self.elements) == 0
 
 
-class String:
+class Boxed:
+    """
+    y 的数字直接用 python 的 int/float 表示, 其余的值是包装对象.
+    String 以及字符串运算得到的 Number 参与运算时取出 value 计算,
+    与 `left.value + right.value` 的结果一致
+    """
+
+    __slots__ = ()
+
+    def __add__(self, other):
+        return box(self.value + unbox(other))
+
+    def __radd__(self, other):
+        return box(unbox(other) + self.value)
+
+    def __sub__(self, other):
+        return box(self.value - unbox(other))
+
+    def __rsub__(self, other):
+        return box(unbox(other) - self.value)
+
+    def __mul__(self, other):
+        return box(self.value * unbox(other))
+
+    def __rmul__(self, other):
+        return box(unbox(other) * self.value)
+
+    def __truediv__(self, other):
+        return box(self.value / unbox(other))
+
+    def __rtruediv__(self, other):
+        return box(unbox(other) / self.value)
+
+    def __mod__(self, other):
+        return box(self.value % unbox(other))
+
+    def __rmod__(self, other):
+        return box(unbox(other) % self.value)
+
+    def __neg__(self):
+        return box(-self.value)
+
+    def __lt__(self, other):
+        return self.value < unbox(other)
+
+    def __le__(self, other):
+        return self.value <= unbox(other)
+
+    def __gt__(self, other):
+        return self.value > unbox(other)
+
+    def __ge__(self, other):
+        return self.value >= unbox(other)
+
+    def __eq__(self, other):
+        return self.value == unbox(other)
+
+    def __ne__(self, other):
+        return self.value != unbox(other)
+
+    def __hash__(self):
+        return hash(self.value)
+
+
+class String(Boxed):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value[1:-1]
 
@@ -39,7 +293,11 @@ class String:
         return len(self.value) == 0
 
 
-class Number:
+class Number(Boxed):
+    """运算结果不是 int/float 时 (如字符串拼接) 的包装对象"""
+
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
@@ -50,13 +308,41 @@ class Number:
         return self.value == 0
 
 
+def is_number(value):
+    # bool 是 int 的子类, 比较运算的结果不是数字
+    cls = value.__class__
+    return cls is int or cls is float
+
+
+def box(value):
+    if is_number(value):
+        return value
+    return Number(value)
+
+
+def unbox(value):
+    if isinstance(value, Boxed):
+        return value.value
+    return value
+
+
+def truthy(value):
+    """y 的真值: 与其他值一样, 数字为 0 时为真"""
+    cls = value.__class__
+    if cls is int or cls is float:
+        return value == 0
+    return bool(value)
+
+
 class And:
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
     def __str__(self):
-        return "true" if self.left and self.right else "false"
+        return "true" if self else "false"
 
     def __bool__(self):
         """
@@ -70,30 +356,34 @@ class And:
 
         return self.left and self.right ==> unexpected result
         """
-        return bool(self.left) and bool(self.right)
+        return truthy(self.left) and truthy(self.right)
 
 
 class Or:
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
     def __str__(self):
-        return "true" if self.left or self.right else "false"
+        return "true" if self else "false"
 
     def __bool__(self):
-        return bool(self.left) or bool(self.right)
+        return truthy(self.left) or truthy(self.right)
 
 
 class Not:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
     def __str__(self):
-        return "false" if self.value else "true"
+        return "true" if self else "false"
 
     def __bool__(self):
-        return not self.value
+        return not truthy(self.value)
 
 
 class Break:
@@ -105,10 +395,22 @@ class Continue:
 
 
 class Return:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
 
+class TailCall(Return):
+    """`return f(...)`: 由调用者执行 f, 而不是在当前函数中嵌套调用"""
+
+    __slots__ = ("function", "args")
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+
+
 class _True:
     def __str__(self):
         return "true"
@@ -150,77 +452,185 @@ def native_print(args):
 
 
 def native_range(args):
-    left, right = args[0].value, args[1].value
-    return [Number(i) for i in range(left, right)]
+    """range(stop) / range(start, stop) / range(start, stop, step)"""
+    if not 1 <= len(args) <= 3:
+        raise InterpreterError("range() takes 1 to 3 arguments")
+    for arg in args:
+        if not isinstance(arg, int):
+            raise InterpreterError("range() argument `%s` is not an integer" % arg)
+    if len(args) == 3 and args[2] == 0:
+        raise InterpreterError("range() step must not be zero")
+    if len(args) == 1:
+        return Range(0, args[0])
+    return Range(*args)
+
+
+def native_len(args):
+    value = args[0]
+    if isinstance(value, (Array, Range)):
+        return len(value.elements)
+    if isinstance(value, String):
+        return len(value.value)
+    raise InterpreterError("`%s` has no len()" % value)
+
+
+def sequence_args(name, args, count):
+    if len(args) != count:
+        raise InterpreterError("%s() takes %d arguments" % (name, count))
+    for arg in args:
+        if not isinstance(arg, Sequence):
+            raise InterpreterError("%s() argument `%s` is not an array" % (name, arg))
+    return [arg.elements for arg in args]
 
 
-builtin_functions = {
-    "print": native_print,
-    "range": native_range,
-    # "len": native_len,
-}
+def native_sum(args):
+    return vector.vsum(*sequence_args("sum", args, 1))
 
 
-class Environment:
-    def __init__(self, outer_space: Optional["ActivationRecord"]):
-        self.kvs = dict()
-        self.outer_space = outer_space
+def native_min(args):
+    return vector.vmin(*sequence_args("min", args, 1))
 
-    def __getitem__(self, key):
-        if key in self.kvs:
-            return self.kvs.get(key)
-        if self.outer_space:
-            return self.outer_space.environ.__getitem__(key)
 
-    def __setitem__(self, key, value):
-        self.kvs[key] = value
+def native_max(args):
+    return vector.vmax(*sequence_args("max", args, 1))
 
-    def set(self, key, value):
-        if key in self.kvs:
-            self.kvs[key] = value
-        if self.outer_space:
-            self.outer_space.environ.set(key, value)
 
-    def __delitem__(self, key):
-        del self.kvs[key]
+def native_dot(args):
+    return vector.dot(*sequence_args("dot", args, 2))
 
 
-class ActivationRecord:
-    def __init__(self, name, type, nesting_level, outer_space=None):
-        self.name = name
-        self.type = type
-        self.nesting_level = nesting_level
-        self.environ = Environment(outer_space)
+# 可以缓存的函数返回值类型 (数字之外)
+immutable_types = (bool, String, Number, _True, _False, Nil)
 
-    def __getitem__(self, key):
-        return self.environ[key]
 
-    def __setitem__(self, key, value):
-        self.environ[key] = value
+def native_memoize(args):
+    """memoize(f): 缓存函数 f 的结果, 用于无法自动判断为纯函数的函数"""
+    if len(args) != 1:
+        raise InterpreterError("memoize() takes 1 argument")
+    func = args[0]
+    if isinstance(func, Function):
+        func.pure = True
+    return func
 
-    def __delitem__(self, key):
-        del self.environ[key]
 
-    def get(self, key):
-        return self.__getitem__(key)
+def native_clock(args):
+    """clock(): 单调递增的高精度时钟, 单位为纳秒"""
+    if args:
+        raise InterpreterError("clock() takes no arguments")
+    return time.perf_counter_ns()
+
+
+# 各个引擎的函数对象的类型 -> call(function, args), 由各个引擎注册, 用于 bench()
+function_callers = {}
+
+
+def run_bench(call, args):
+    """
+    bench(f, n): 先预热, 再调用没有参数的函数 f n 次,
+    返回每次调用耗时 (纳秒) 的 [最小值, 中位数, 平均值]
+    """
+    if len(args) != 2:
+        raise InterpreterError("bench() takes 2 arguments")
+    func, iterations = args
+    if iterations.__class__ is not int or iterations <= 0:
+        raise InterpreterError("bench() iterations must be a positive integer")
+    for _ in range(max(1, iterations // 10)):
+        call(func, [])
+
+    clock = time.perf_counter_ns
+    timings = []
+    for _ in range(iterations):
+        start = clock()
+        call(func, [])
+        timings.append(clock() - start)
+    return Array(
+        [min(timings), statistics.median_low(timings), sum(timings) // iterations]
+    )
+
+
+def native_bench(args):
+    func = args[0] if args else None
+    call = function_callers.get(func.__class__)
+    if call is None:
+        raise InterpreterError("bench() can not call `%s`" % func)
+    return run_bench(call, args)
 
-    def set(self, key, value):
-        """
-        NOTE: 这里 set 和 __setitem__ 语义并不等同.
-        __setitem__: 只会向当前活动记录添加kv对;
-        set: 如果当前活动记录不存在key, set会递归查找上层;
-        """
-        self.environ.set(key, value)
+
+builtin_functions = {
+    "print": native_print,
+    "range": native_range,
+    "len": native_len,
+    "sum": native_sum,
+    "min": native_min,
+    "max": native_max,
+    "dot": native_dot,
+    "memoize": native_memoize,
+    "clock": native_clock,
+    "bench": native_bench,
+}
+
+
+class ActivationRecord:
+    """
+    活动记录, 变量保存在固定大小的列表中.
+    变量的 (depth, slot) 坐标由 resolver.Resolver 在执行前计算.
+    """
+
+    __slots__ = (
+        "name",
+        "type",
+        "nesting_level",
+        "outer_space",
+        "names",
+        "slots",
+        "captured",
+    )
+
+    def __init__(self, name, type, nesting_level, outer_space=None, names=()):
+        self.name = name
+        self.type = type
+        self.nesting_level = nesting_level
+        self.outer_space = outer_space
+        # slot -> 变量名, 仅用于调试输出
+        self.names = names
+        self.slots = [None] * len(names)
+        # 被函数 (闭包) 引用, 执行结束后不能回收
+        self.captured = False
+
+    def capture(self):
+        """在这个活动记录中定义函数时, 函数会引用它以及它外层的活动记录"""
+        frame = self
+        while frame is not None and not frame.captured:
+            frame.captured = True
+            frame = frame.outer_space
+
+    def lookup(self, depth, slot):
+        frame = self
+        while depth:
+            frame = frame.outer_space
+            depth -= 1
+        return frame.slots[slot]
+
+    def assign(self, depth, slot, value):
+        frame = self
+        while depth:
+            frame = frame.outer_space
+            depth -= 1
+        frame.slots[slot] = value
 
     def __str__(self):
         lines = ["%d: %s %s" % (self.nesting_level, self.type.value, self.name)]
-        for k, v in self.environ.kvs.items():
+        for k, v in zip(self.names, self.slots):
             lines.append(f"    {k:<16}: {v}")
         s = "\n".join(lines)
         return s
 
     def upper(self):
-        return self.environ.outer_space
+        return self.outer_space
+
+
+# 回收的活动记录最多保留的个数
+frame_pool_size = 256
 
 
 class ARType(Enum):
@@ -230,9 +640,21 @@ class ARType(Enum):
 
 
 class Interpreter(NodeVisitor):
-    def __init__(self):
+    def __init__(self, memo_size=1024):
         self.current_frame: ActivationRecord
         self.call_stack = Stack()
+        # 每个纯函数最多缓存的结果个数, 0 表示不缓存
+        self.memo_size = memo_size
+        self.memos = []
+        self.global_version = next(versions)
+        # 内联缓存的命中统计
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 回收的活动记录, 函数调用和 block 优先从这里取, 减少对象的创建
+        self.free_frames = []
+        # 内置函数, 子类可以替换 (如 profiler.ProfilingInterpreter).
+        # bench() 直接使用 self.call 调用函数, 不经过 visit_FunctionCall
+        self.builtins = dict(builtin_functions, bench=self.native_bench)
 
     def run(self, ast_tree):
         self.visit(ast_tree)
@@ -241,7 +663,9 @@ class Interpreter(NodeVisitor):
         print("Unknown `%s`" % type(node))
 
     def visit_Program(self, node):
-        main_frame = ActivationRecord("main", ARType.PROGRAM, nesting_level=1)
+        main_frame = ActivationRecord(
+            "main", ARType.PROGRAM, nesting_level=1, names=node.names
+        )
         self.call_stack.push(main_frame)
         self.current_frame = main_frame
 
@@ -255,100 +679,214 @@ class Interpreter(NodeVisitor):
             value = self.visit(node.expr_node)
         else:
             value = nil
-        self.current_frame[node.var.token.value] = value
+        slots = self.current_frame.slots
+        self.rebind(slots[node.var.slot], value)
+        slots[node.var.slot] = value
 
     def visit_FuncDecl(self, node):
         f_name = node.func.token.value
-        f_params = [p.value for p in node.params]
+        f_params = node.names
         f_block = node.block
-        f_obj = Function(f_name, f_params, f_block)
-        self.current_frame[f_name] = f_obj
+        self.current_frame.capture()
+        f_obj = Function(f_name, f_params, f_block, self.current_frame, node.pure)
+        self.current_frame.slots[node.func.slot] = f_obj
+        self.global_version = next(versions)
+
+    def rebind(self, old, new):
+        """变量的旧值或者新值是函数时, 之前缓存的调用目标可能已经改变"""
+        if old.__class__ is Function or new.__class__ is Function:
+            self.global_version = next(versions)
 
     def visit_String(self, node):
         return String(node.token.value)
 
     def visit_FunctionCall(self, node):
-        f_name = str(node.func.token.value)
-        if f_name in builtin_functions:
+        f_obj = self.callee(node)
+        if f_obj.__class__ is not Function:
             args = []
             for arg in node.arguments:
                 args.append(self.visit(arg))
-            return builtin_functions[f_name](args)
+            return f_obj(args)
 
-        new_frame = ActivationRecord(
-            f_name,
-            ARType.FUNCTION,
-            self.current_frame.nesting_level + 1,
-            self.current_frame,
-        )
-        f_obj = self.current_frame.get(f_name)
+        # 多余的实参忽略
+        args = [self.visit(arg) for arg in node.arguments[: len(f_obj.params)]]
+        if f_obj.pure and self.memo_size:
+            return self.call_memoized(f_obj, args)
+        return self.call(f_obj, args)
+
+    def callee(self, node):
+        """
+        调用的函数 (Function 或者内置函数). 调用内置函数和全局函数时使用内联缓存:
+        缓存的目标和全局环境的版本号保存在 FunctionCall 节点上, 版本号一致时不需要再查找
+        """
+        if node.cache_version == self.global_version:
+            self.cache_hits += 1
+            return node.cache_target
+        self.cache_misses += 1
+        if node.builtin:
+            target = self.builtins[node.func.token.value]
+        else:
+            target = self.lookup_function(node)
+            # 局部变量 (如形参) 每次调用的值都可能不同
+            if not node.global_target:
+                return target
+        node.cache_target = target
+        node.cache_version = self.global_version
+        return target
+
+    def lookup_function(self, node):
+        f_obj = None
+        if node.func.depth is not None:
+            f_obj = self.current_frame.lookup(node.func.depth, node.func.slot)
         if f_obj is None:
             while self.call_stack.peek():
                 print("-" * 20)
                 print(self.call_stack.pop())
 
-            raise InterpreterError("Function `%s` is not defined" % f_name)
-        # 将形参 - 实参对存入ActivationRecord中
-        for param, arg in zip(f_obj.params, node.arguments):
-            new_frame[param] = self.visit(arg)
+            raise InterpreterError(
+                "Function `%s` is not defined" % node.func.token.value
+            )
+        return f_obj
+
+    def call_memoized(self, f_obj, args):
+        key = memo_key(args)
+        if key is None:
+            return self.call(f_obj, args)
+        memo = f_obj.memo
+        if memo is None:
+            memo = f_obj.memo = Memo(f_obj.name, self.memo_size)
+            self.memos.append(memo)
+        result = memo.get(key)
+        if result is None:
+            result = self.call(f_obj, args)
+            # 数组等可变的值不缓存, 每次调用都返回新的对象
+            if is_number(result) or isinstance(result, immutable_types):
+                memo.put(key, result)
+        return result
+
+    def call(self, f_obj, args):
+        """
+        执行函数. 函数以尾调用返回时 (TailCall), 在这里继续执行被调用的函数,
+        调用栈和 python 栈的深度都不会增加
+        """
+        caller = self.current_frame
+        while True:
+            new_frame = self.new_frame(
+                f_obj.name,
+                ARType.FUNCTION,
+                caller.nesting_level + 1,
+                f_obj.closure,
+                f_obj.params,
+            )
+            new_frame.slots[: len(args)] = args
+            self.call_stack.push(new_frame)
+            self.current_frame = new_frame
+
+            # 执行函数
+            retval = self.visit(f_obj.block)
+
+            if debug:
+                print(self.current_frame)
 
-        self.call_stack.push(new_frame)
-        self.current_frame = new_frame
+            self.call_stack.pop()
+            self.current_frame = caller
+            self.release_frame(new_frame)
+            if retval.__class__ is not TailCall:
+                break
+            f_obj = retval.function
+            args = retval.args
 
-        # 执行函数
-        retval = self.visit(f_obj.block)
         assert retval is nil or isinstance(retval, Return)
-
-        if debug:
-            print(self.current_frame)
-
-        self.call_stack.pop()
-        self.current_frame = self.call_stack.peek()
-
         if isinstance(retval, Return):
             return retval.value
         return retval
 
+    def native_bench(self, args):
+        if args and args[0].__class__ is Function:
+            return run_bench(self.call, args)
+        return native_bench(args)
+
+    def stats(self):
+        """内联缓存和纯函数缓存的命中统计"""
+        lines = [
+            "%-20s hits=%d misses=%d"
+            % ("<inline cache>", self.cache_hits, self.cache_misses)
+        ]
+        return lines + [str(memo) for memo in self.memos]
+
     def visit_Block(self, node) -> Union[Return, Break, Continue, Nil]:
-        new_frame = ActivationRecord(
+        if not node.scoped:
+            # 没有声明变量的 block 直接使用外层的活动记录
+            return self.execute(node.declarations)
+
+        new_frame = self.new_frame(
             "<block>",
             ARType.BLOCK,
             self.current_frame.nesting_level + 1,
             self.current_frame,
+            node.names,
         )
         self.call_stack.push(new_frame)
         self.current_frame = new_frame
         try:
-            for declaration in node.declarations:
-                retval = self.visit(declaration)
-                if isinstance(retval, Return):
-                    return retval
-
-                """
-                当执行到break/continue语句的时候, 应该传递给上层(比如for-block, while-block)
-                var a = 1
-                while true:                 | block1
-                    a = a + 1               |
-                    if a == 10:    | block2 |
-                        break      |        |
-                """
-                if retval is Break:
-                    return retval
-
-                if retval is Continue:
-                    return retval
-
-            # block执行结束, 没有遇到return/break/continue
-            return nil
+            return self.execute(node.declarations)
         finally:
             self.call_stack.pop()
             self.current_frame = self.call_stack.peek()
+            self.release_frame(new_frame)
+
+    def new_frame(self, name, type, nesting_level, outer_space, names):
+        free_frames = self.free_frames
+        if not free_frames:
+            return ActivationRecord(name, type, nesting_level, outer_space, names)
+        frame = free_frames.pop()
+        frame.name = name
+        frame.type = type
+        frame.nesting_level = nesting_level
+        frame.outer_space = outer_space
+        frame.names = names
+        frame.slots = [None] * len(names)
+        return frame
+
+    def release_frame(self, frame):
+        """回收执行结束的活动记录, 被闭包引用的除外"""
+        if frame.captured or len(self.free_frames) >= frame_pool_size:
+            return
+        # 不再引用其中的值
+        frame.outer_space = None
+        frame.slots = None
+        self.free_frames.append(frame)
+
+    def execute(self, declarations):
+        for declaration in declarations:
+            retval = self.visit(declaration)
+            if isinstance(retval, Return):
+                return retval
+
+            """
+            当执行到break/continue语句的时候, 应该传递给上层(比如for-block, while-block)
+            var a = 1
+            while true:                 | block1
+                a = a + 1               |
+                if a == 10:    | block2 |
+                    break      |        |
+            """
+            if retval is Break:
+                return retval
+
+            if retval is Continue:
+                return retval
+
+        # block执行结束, 没有遇到return/break/continue
+        return nil
 
     def visit_Number(self, node):
-        return Number(node.token.value)
+        return node.value
 
     def visit_Identifier(self, node):
-        retval = self.current_frame.get(node.token.value)
+        retval = None
+        if node.depth is not None:
+            retval = self.current_frame.lookup(node.depth, node.slot)
         if retval is None:
             raise InterpreterError("Identifier `%s` is not defined" % node.token.value)
         return retval
@@ -356,35 +894,39 @@ class Interpreter(NodeVisitor):
     def visit_Add(self, node):
         left = self.visit(node.left)
         right = self.visit(node.right)
-        return Number(left.value + right.value)
+        return left + right
 
     def visit_Sub(self, node):
         left = self.visit(node.left)
         right = self.visit(node.right)
-        return Number(left.value - right.value)
+        return left - right
 
     def visit_Mul(self, node):
         left = self.visit(node.left)
         right = self.visit(node.right)
-        return Number(left.value * right.value)
+        return left * right
 
     def visit_Div(self, node):
         left = self.visit(node.left)
         right = self.visit(node.right)
-        return Number(left.value / right.value)
+        return left / right
 
     def visit_Mod(self, node):
         left = self.visit(node.left)
         right = self.visit(node.right)
-        return Number(left.value % right.value)
+        return left % right
+
+    def visit_Negative(self, node):
+        value = self.visit(node.node)
+        return -value
 
     def visit_If(self, node):
         # if
-        if self.visit(node.if_part.condition):
+        if truthy(self.visit(node.if_part.condition)):
             return self.visit(node.if_part.block)
         # elifs
         for part in node.elif_parts:
-            if self.visit(part.condition):
+            if truthy(self.visit(part.condition)):
                 return self.visit(part.block)
         # else
         if node.else_part:
@@ -398,46 +940,50 @@ class Interpreter(NodeVisitor):
         right = self.visit(node.right)
         op_type = node.op_type
         if op_type == "<":
-            return left.value < right.value
+            return left < right
         elif op_type == "<=":
-            return left.value <= right.value
+            return left <= right
         elif op_type == ">":
-            return left.value > right.value
+            return left > right
         elif op_type == ">=":
-            return left.value >= right.value
+            return left >= right
         elif op_type == "==":
-            return left.value == right.value
+            return left == right
         elif op_type == "!=":
-            return left.value != right.value
+            return left != right
         else:
             raise InterpreterError("Unknown Compare op_type `%s`" % op_type)
 
     def visit_Return(self, node):
-        frame = self.current_frame
-        while frame.type != ARType.PROGRAM:
-            if frame.type == ARType.FUNCTION:
-                return Return(self.visit(node.expr_node))
-            frame = frame.upper()
-            assert frame != None
-
-        raise InterpreterError("`return` outside function")
+        # `return` 只能出现在函数中, 由 Resolver 检查
+        if node.tail_call:
+            call = node.expr_node
+            f_obj = self.callee(call)
+            args = [self.visit(arg) for arg in call.arguments[: len(f_obj.params)]]
+            return TailCall(f_obj, args)
+        return Return(self.visit(node.expr_node))
 
     def visit_Assign(self, node):
         expr = self.visit(node.expr)
         if type(node.left).__name__ == "ArrayAccess":
-            arr_name = node.left.node.token.value
             arr_index = self.visit(node.left.index)
-            array = self.current_frame[arr_name]
+            array = self.visit(node.left.node)
             assert isinstance(array, Array)
-            assert isinstance(arr_index, Number)
-            assert arr_index.value < len(array.elements)
-            array.elements[arr_index.value] = expr
+            assert is_number(arr_index)
+            assert arr_index < len(array.elements)
+            array.store(arr_index, expr)
             return
 
-        left_name = node.left.token.value
-        if self.current_frame.get(left_name) is None:
-            raise InterpreterError("Assign to an unknown variable `%s`" % left_name)
-        self.current_frame.set(left_name, expr)
+        left = node.left
+        old = None
+        if left.depth is not None:
+            old = self.current_frame.lookup(left.depth, left.slot)
+        if old is None:
+            raise InterpreterError(
+                "Assign to an unknown variable `%s`" % left.token.value
+            )
+        self.rebind(old, expr)
+        self.current_frame.assign(left.depth, left.slot, expr)
 
     def visit_And(self, node):
         left = self.visit(node.left)
@@ -469,44 +1015,45 @@ class Interpreter(NodeVisitor):
         return Continue
 
     def visit_While(self, node):
-        while self.visit(node.condition):
+        while truthy(self.visit(node.condition)):
             retval = self.visit(node.block)
             if isinstance(retval, Return):
-                return retval.value
+                return retval
             if retval is Break:
                 break
             if retval is Continue:
                 continue
 
     def visit_RangeFor(self, node):
-        var_name = node.var.token.value
+        var_slot = node.var.slot
         iterable = self.visit(node.iterable)
         for value in iterable:
+            if value.__class__ is Function:
+                self.global_version = next(versions)
             try:
-                self.current_frame[var_name] = value
+                self.current_frame.slots[var_slot] = value
                 retval = self.visit(node.block)
                 if isinstance(retval, Return):
-                    return retval.value
+                    return retval
                 if retval is Break:
                     break
                 if retval is Continue:
                     continue
             finally:
-                del self.current_frame[var_name]
+                self.current_frame.slots[var_slot] = None
+                if value.__class__ is Function:
+                    self.global_version = next(versions)
 
     def visit_For(self, node):
         self.visit(node.init)
-        while self.visit(node.cond):
-            try:
-                retval = self.visit(node.block)
-                if isinstance(retval, Return):
-                    return retval.value
-                if retval is Break:
-                    break
-                if retval is Continue:
-                    continue
-            finally:
-                self.visit(node.incr)
+        while truthy(self.visit(node.cond)):
+            retval = self.visit(node.block)
+            if isinstance(retval, Return):
+                return retval
+            if retval is Break:
+                break
+            # continue 同样需要执行 incr
+            self.visit(node.incr)
 
     def visit_Array(self, node):
         elements = []
@@ -515,15 +1062,9 @@ class Interpreter(NodeVisitor):
         return Array(elements)
 
     def visit_ArrayAccess(self, node):
-        arr_name = self.visit(node.node)
+        array = self.visit(node.node)
         arr_index = self.visit(node.index)
-        assert isinstance(arr_index, Number)
-        if isinstance(arr_name, Array):
-            assert arr_index.value < len(arr_name.elements)
-            return arr_name.elements[arr_index.value]
-
-        arr_name = node.node.token.value
-        array = self.current_frame[arr_name]
-        assert isinstance(array, Array)
-        assert arr_index.value < len(array.elements)
-        return array.elements[arr_index.value]
+        assert isinstance(array, (Array, Range))
+        assert is_number(arr_index)
+        assert arr_index < len(array.elements)
+        return array.elements[arr_index]
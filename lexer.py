@@ -80,6 +80,8 @@ keyword_dict = _build_keywords()
 
 
 class Token(object):
+    __slots__ = ("type", "value")
+
     def __init__(self, type, value=None):
         self.type = type
         self.value = value
@@ -210,20 +212,25 @@ class Lexer:
             # 反缩进(可能有多个)
             while indent_len < self.indent_stack.peek():
                 self.indent_stack.pop()
-                token = Token(TokenType.DEDENT)
-                self.token_queue.put(token)
+                yield Token(TokenType.DEDENT)
 
             # 缩进
             if indent_len > self.indent_stack.peek():
                 self.indent_stack.push(indent_len)
-                token = Token(TokenType.INDENT, value)
-                self.token_queue.put(token)
+                yield Token(TokenType.INDENT, value)
 
     def run(self):
         """执行结束返回token列表"""
+        for token in self.tokens():
+            self.token_queue.put(token)
+
+        return self.token_queue
+
+    def tokens(self):
+        """逐个生成 token, 不需要把所有 token 保存在内存中"""
         while self.ok():
             self.skip_blanklines()
-            self.handle_indent()
+            yield from self.handle_indent()
 
             # skip whitespace
             if self.current_char.isspace():
@@ -233,160 +240,127 @@ class Lexer:
             elif self.current_char == "#":
                 value = self.get_comment()
                 if not skip_comment:
-                    token = Token(TokenType.COMMENT, value)
-                    self.token_queue.put(token)
+                    yield Token(TokenType.COMMENT, value)
 
             # string
             elif self.current_char == '"':
                 value = self.get_string()
-                token = Token(TokenType.STRING, value)
-                self.token_queue.put(token)
+                yield Token(TokenType.STRING, value)
 
             # number
             elif self.current_char.isdigit():
                 value = self.get_number()
-                token = Token(TokenType.NUMBER, value)
-                self.token_queue.put(token)
+                yield Token(TokenType.NUMBER, value)
 
             # two-character tokens
             elif self.current_char == "<" and self.peek() == "=":
-                token = Token(TokenType.LESS_EQUAL, "<=")
-                self.token_queue.put(token)
+                yield Token(TokenType.LESS_EQUAL, "<=")
                 self.advance(2)
 
             elif self.current_char == ">" and self.peek() == "=":
-                token = Token(TokenType.GREATER_EQUAL, ">=")
-                self.token_queue.put(token)
+                yield Token(TokenType.GREATER_EQUAL, ">=")
                 self.advance(2)
 
             elif self.current_char == "!" and self.peek() == "=":
-                token = Token(TokenType.NOT_EQUAL, "!=")
-                self.token_queue.put(token)
+                yield Token(TokenType.NOT_EQUAL, "!=")
                 self.advance(2)
 
             elif self.current_char == "=" and self.peek() == "=":
-                token = Token(TokenType.EQUAL, "==")
-                self.token_queue.put(token)
+                yield Token(TokenType.EQUAL, "==")
                 self.advance(2)
 
             elif self.current_char == "&" and self.peek() == "&":
-                token = Token(TokenType.AND, "&&")
-                self.token_queue.put(token)
+                yield Token(TokenType.AND, "&&")
                 self.advance(2)
 
             elif self.current_char == "|" and self.peek() == "|":
-                token = Token(TokenType.OR, "||")
-                self.token_queue.put(token)
+                yield Token(TokenType.OR, "||")
                 self.advance(2)
 
             # single character tokens
             elif self.current_char == "+":
-                token = Token(TokenType.PLUS, "+")
-                self.token_queue.put(token)
+                yield Token(TokenType.PLUS, "+")
                 self.advance()
 
             elif self.current_char == "-":
-                token = Token(TokenType.MINUS, "-")
-                self.token_queue.put(token)
+                yield Token(TokenType.MINUS, "-")
                 self.advance()
 
             elif self.current_char == "*":
-                token = Token(TokenType.MUL, "*")
-                self.token_queue.put(token)
+                yield Token(TokenType.MUL, "*")
                 self.advance()
 
             elif self.current_char == "/":
-                token = Token(TokenType.DIV, "/")
-                self.token_queue.put(token)
+                yield Token(TokenType.DIV, "/")
                 self.advance()
 
             elif self.current_char == "%":
-                token = Token(TokenType.MOD, "%")
-                self.token_queue.put(token)
+                yield Token(TokenType.MOD, "%")
                 self.advance()
 
             elif self.current_char == "(":
-                token = Token(TokenType.L_PAREN, "(")
-                self.token_queue.put(token)
+                yield Token(TokenType.L_PAREN, "(")
                 self.advance()
 
             elif self.current_char == ")":
-                token = Token(TokenType.R_PAREN, ")")
-                self.token_queue.put(token)
+                yield Token(TokenType.R_PAREN, ")")
                 self.advance()
 
             elif self.current_char == "[":
-                token = Token(TokenType.L_SQUARE, "[")
-                self.token_queue.put(token)
+                yield Token(TokenType.L_SQUARE, "[")
                 self.advance()
 
             elif self.current_char == "]":
-                token = Token(TokenType.R_SQUARE, "]")
-                self.token_queue.put(token)
+                yield Token(TokenType.R_SQUARE, "]")
                 self.advance()
 
             elif self.current_char == "{":
-                token = Token(TokenType.L_CURLY, "{")
-                self.token_queue.put(token)
+                yield Token(TokenType.L_CURLY, "{")
                 self.advance()
 
             elif self.current_char == "}":
-                token = Token(TokenType.R_CURLY, "}")
-                self.token_queue.put(token)
+                yield Token(TokenType.R_CURLY, "}")
                 self.advance()
 
             elif self.current_char == "<":
-                token = Token(TokenType.LESS, "<")
-                self.token_queue.put(token)
+                yield Token(TokenType.LESS, "<")
                 self.advance()
 
             elif self.current_char == ">":
-                token = Token(TokenType.GREATER, ">")
-                self.token_queue.put(token)
+                yield Token(TokenType.GREATER, ">")
                 self.advance()
 
             elif self.current_char == "=":
-                token = Token(TokenType.ASSIGN, "=")
-                self.token_queue.put(token)
+                yield Token(TokenType.ASSIGN, "=")
                 self.advance()
 
             elif self.current_char == "!":
-                token = Token(TokenType.NOT, "!")
-                self.token_queue.put(token)
+                yield Token(TokenType.NOT, "!")
                 self.advance()
 
             elif self.current_char == ",":
-                token = Token(TokenType.COMMA, ",")
-                self.token_queue.put(token)
+                yield Token(TokenType.COMMA, ",")
                 self.advance()
 
             elif self.current_char == ":":
-                token = Token(TokenType.COLON, ":")
-                self.token_queue.put(token)
+                yield Token(TokenType.COLON, ":")
                 self.advance()
 
             elif self.current_char == ";":
-                token = Token(TokenType.SEMICOLON, ";")
-                self.token_queue.put(token)
+                yield Token(TokenType.SEMICOLON, ";")
                 self.advance()
 
             # identifier
             elif self.current_char.isalpha() or self.current_char == "_":
                 id = self.get_identifier()
                 if id in keyword_dict:
-                    token = Token(keyword_dict[id], id)
+                    yield Token(keyword_dict[id], id)
                 else:
-                    token = Token(TokenType.ID, id)
-
-                self.token_queue.put(token)
+                    yield Token(TokenType.ID, id)
 
             else:
                 self.raise_error()
 
         while self.indent_stack.pop():
-            token = Token(TokenType.DEDENT)
-            self.token_queue.put(token)
-        token = Token(TokenType.EOF, "EOF")
-        self.token_queue.put(token)
-
-        return self.token_queue
+            yield Token(TokenType.DEDENT)
+        yield Token(TokenType.EOF, "EOF")
@@ -0,0 +1,61 @@
+# 循环中每次迭代声明的变量是新的, 闭包引用各自的变量
+var fs = [nil, nil]
+for (var i = 0; i < 2; i = i + 1):
+    var j = i
+    func g():
+        return j
+    fs[i] = g
+var g0 = fs[0]
+var g1 = fs[1]
+print(g0(), g1())
+
+var hs = [nil, nil]
+for k in range(2):
+    var m = k * 10
+    func h():
+        return m
+    hs[k] = h
+var h0 = hs[0]
+var h1 = hs[1]
+print(h0(), h1())
+
+func make():
+    var out = [nil, nil]
+    for n in range(2):
+        var q = n + 5
+        func r():
+            return q
+        out[n] = r
+    return out
+
+var rs = make()
+var r0 = rs[0]
+var r1 = rs[1]
+print(r0(), r1())
+
+func shared():
+    var fs = [nil, nil, nil, nil]
+    var count = 0
+    var base = 100
+    for (var i = 0; i < 6; i = i + 1):
+        var j = i
+        func g():
+            j = j + base
+            return j
+        if i == 1:
+            continue
+        if i > 4:
+            break
+        fs[count] = g
+        count = count + 1
+        g()
+        if j < 0:
+            print("never")
+        print(j)
+    var total = 0
+    for n in range(count):
+        var f = fs[n]
+        total = total + f()
+    return total
+
+print(shared())
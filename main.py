@@ -1,10 +1,24 @@
 #!/usr/bin/env python3
 import argparse
+import sys
 
+import cache
+from closure import ClosureInterpreter
+from compiler import Compiler
+from compiler import disassemble
 from interpreter import Interpreter
-from lexer import Lexer
+from optimizer import Optimizer
 from parser import Parser
+from profiler import CountingInterpreter
+from profiler import ProfilingInterpreter
+from profiler import Sampler
+from purity import Purity
+from resolver import Resolver
+from scanner import Scanner
+from transpiler import PythonInterpreter
+from transpiler import Transpiler
 from visualize_ast import VisualizeAST
+from vm import VM
 
 
 def main():
@@ -13,17 +27,98 @@ def main():
     arg_parser.add_argument("--debug", action="store_true", help="开启调试")
     arg_parser.add_argument("--ast", action="store_true", help="生成AST")
     arg_parser.add_argument("--ast-file", help="生成AST文件名", default="astree.dot")
+    arg_parser.add_argument(
+        "--engine",
+        choices=["tree", "vm", "closure", "python"],
+        default="tree",
+        help="执行引擎: tree(遍历AST) / vm(字节码虚拟机) / closure(预编译为闭包)"
+        " / python(转换为python代码执行)",
+    )
+    arg_parser.add_argument("--disasm", action="store_true", help="输出字节码")
+    arg_parser.add_argument("--emit-python", help="将转换得到的python代码写入文件")
+    arg_parser.add_argument(
+        "--no-cache", action="store_true", help="不读取也不写入 __ycache__ 中的解析结果"
+    )
+    arg_parser.add_argument(
+        "-O",
+        dest="optimize",
+        type=int,
+        choices=[0, 1],
+        default=1,
+        help="优化级别: 0 关闭 AST 优化, 1 常量折叠并删除不会执行的代码 (默认)",
+    )
+    arg_parser.add_argument(
+        "--memo-size",
+        type=int,
+        default=1024,
+        help="tree 引擎中每个纯函数最多缓存的结果个数, 0 表示不缓存",
+    )
+    arg_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="统计每个 y 函数的调用次数和耗时, 执行结束后输出 (只支持 tree 引擎)",
+    )
+    arg_parser.add_argument("--profile-file", help="将性能分析的结果以 JSON 格式写入文件")
+    arg_parser.add_argument(
+        "--sample-profile",
+        metavar="FILE",
+        help="定时采样 y 的调用栈, 以 collapsed stack 格式写入文件, 用于生成火焰图 (只支持 tree 引擎)",
+    )
+    arg_parser.add_argument(
+        "--sample-interval",
+        type=float,
+        default=1.0,
+        help="采样间隔, 单位为毫秒 (CPU 时间)",
+    )
+    arg_parser.add_argument(
+        "--count-ops",
+        action="store_true",
+        help="统计各种节点的求值次数, 函数调用和活动记录的个数, 执行结束后输出 (只支持 tree 引擎)",
+    )
+    arg_parser.add_argument("--count-ops-file", help="将操作计数以 JSON 格式写入文件")
     args = arg_parser.parse_args()
+    if (args.profile or args.profile_file) and args.engine != "tree":
+        arg_parser.error("--profile only supports the tree engine")
+    count_ops = args.count_ops or args.count_ops_file
+    if count_ops and args.engine != "tree":
+        arg_parser.error("--count-ops only supports the tree engine")
+    if count_ops and (args.profile or args.profile_file):
+        arg_parser.error("--count-ops cannot be combined with --profile")
+    if args.sample_profile and args.engine != "tree":
+        arg_parser.error("--sample-profile only supports the tree engine")
+    if args.sample_interval <= 0:
+        arg_parser.error("--sample-interval must be positive")
     with open(args.file) as fp:
         program = fp.read()
 
-    lexer = Lexer(program)
-    tokens = lexer.run()
-    if args.debug:
-        print(tokens)
+    cached = None
+    if not args.no_cache and not args.debug:
+        cached = cache.load(args.file, program, (args.optimize,))
+
+    if cached:
+        ast, warnings = cached
+    else:
+        lexer = Scanner(program)
+        if args.debug:
+            tokens = lexer.run()
+            print(tokens)
+        else:
+            tokens = lexer.tokens()
+
+        parser = Parser(tokens)
+        ast = parser.run()
+        if args.optimize:
+            ast = Optimizer().run(ast)
+        resolver = Resolver()
+        resolver.run(ast)
+        warnings = resolver.warnings
+        Purity().run(ast)
+        if not args.no_cache:
+            cache.store(args.file, program, ast, warnings, (args.optimize,))
+
+    for warning in warnings:
+        print("warning: %s" % warning, file=sys.stderr)
 
-    parser = Parser(tokens)
-    ast = parser.run()
     if args.ast:
         ast_visitor = VisualizeAST()
         ast_visitor.visit(ast)
@@ -33,8 +128,46 @@ def main():
         with open(args.ast_file, "w") as f:
             f.write(dot)
 
-    interpreter = Interpreter()
-    interpreter.run(ast)
+    if args.engine == "vm" or args.disasm:
+        code = Compiler().compile(ast)
+        if args.disasm:
+            print(disassemble(code))
+
+    if args.engine == "python" or args.emit_python:
+        source = Transpiler().transpile(ast)
+        if args.emit_python:
+            with open(args.emit_python, "w") as f:
+                f.write(source)
+
+    if args.engine == "vm":
+        VM().execute(code)
+    elif args.engine == "closure":
+        ClosureInterpreter().run(ast)
+    elif args.engine == "python":
+        PythonInterpreter(args.emit_python or "<y:%s>" % args.file).execute(source)
+    else:
+        if args.profile or args.profile_file:
+            interpreter = ProfilingInterpreter(args.memo_size)
+        elif count_ops:
+            interpreter = CountingInterpreter(args.memo_size)
+        else:
+            interpreter = Interpreter(args.memo_size)
+
+        if args.sample_profile:
+            with Sampler(interpreter, args.sample_interval / 1000) as sampler:
+                interpreter.run(ast)
+            sampler.dump(args.sample_profile)
+        else:
+            interpreter.run(ast)
+
+        if args.profile or args.count_ops:
+            for line in interpreter.report():
+                print(line, file=sys.stderr)
+        if args.profile_file or args.count_ops_file:
+            interpreter.dump(args.profile_file or args.count_ops_file)
+        if args.debug:
+            for line in interpreter.stats():
+                print(line)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+# 嵌套函数可以访问外层函数的局部变量
+func outer(a):
+    var b = a * 2
+    func inner(c):
+        return a + b + c
+    return inner(a + 7)
+
+print(outer(3))
+
+func counter():
+    var n = 0
+    func incr():
+        n = n + 1
+        return n
+    return incr
+
+var next = counter()
+next()
+next()
+print(next())
+
+func deep(x):
+    func mid(y):
+        func leaf(z):
+            return x * 100 + y * 10 + z
+        return leaf(3)
+    return mid(2)
+
+print(deep(1))
@@ -0,0 +1,294 @@
+import math
+import operator
+
+import parser
+from exception import InterpreterError
+from interpreter import false
+from interpreter import is_number
+from interpreter import nil
+from interpreter import String
+from interpreter import true
+from interpreter import truthy
+from lexer import Token
+from lexer import TokenType
+from visitor import NodeVisitor
+
+arith_funcs = {
+    parser.Add: operator.add,
+    parser.Sub: operator.sub,
+    parser.Mul: operator.mul,
+    parser.Div: operator.truediv,
+    parser.Mod: operator.mod,
+}
+
+compare_funcs = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# 执行后不会再执行同一个 Block 中后续语句的节点
+terminators = (parser.Return, parser.Break, parser.Continue)
+
+
+class NotConstant:
+    pass
+
+
+def constant(node):
+    """字面量在运行时的值, 其他节点返回 NotConstant"""
+    if isinstance(node, parser.Number):
+        return node.value
+    if isinstance(node, parser.String):
+        return String(node.token.value)
+    if isinstance(node, parser._True):
+        return true
+    if isinstance(node, parser._False):
+        return false
+    if isinstance(node, parser.Nil):
+        return nil
+    return NotConstant
+
+
+def number(value):
+    return parser.Number(Token(TokenType.NUMBER, value))
+
+
+def boolean(value):
+    return parser._True() if value else parser._False()
+
+
+class Optimizer(NodeVisitor):
+    """
+    AST 优化, 在 Resolver 之前执行. 每个 visit_* 返回替换后的节点, 返回 None 表示删除该语句.
+        常量折叠: 数字的算术运算, 以及只关心真值的位置 (条件, &&, ||, !) 上的比较和逻辑运算
+        删除条件恒为假的分支和循环, 条件恒为真的 if 直接替换为对应的 Block
+        删除 Block 中 return/break/continue 之后的语句
+    比较运算的结果会被 print 输出为 True/False, 与 true/false 字面量不同,
+    所以只在只关心真值的位置折叠. 字符串运算和除零不折叠, 保留运行时的行为.
+    """
+
+    def run(self, program):
+        return self.visit(program)
+
+    def visit_Unknown(self, node):
+        raise InterpreterError("Cannot optimize `%s`" % type(node).__name__)
+
+    def expr(self, node):
+        # 解析失败的表达式可能为 None
+        if node is None:
+            return None
+        return self.visit(node)
+
+    def truth(self, node):
+        """节点的真值, 在编译期无法确定时返回 None"""
+        while isinstance(node, parser.Expr):
+            node = node.expr_node
+        if isinstance(node, parser.Compare):
+            value = self.compare(node)
+        else:
+            value = constant(node)
+        if value is NotConstant:
+            return None
+        return truthy(value)
+
+    def condition(self, node):
+        """只关心真值的表达式, 真值确定时替换为 true/false"""
+        node = self.expr(node)
+        value = self.truth(node)
+        if value is None:
+            return node
+        return boolean(value)
+
+    def statements(self, declarations, in_block=True):
+        result = []
+        for declaration in declarations:
+            declaration = self.visit(declaration)
+            if declaration is None:
+                continue
+            result.append(declaration)
+            # 顶层的 break/continue 不会中断程序的执行
+            if in_block and isinstance(declaration, terminators):
+                break
+        return result
+
+    def visit_Program(self, node):
+        node.declarations = self.statements(node.declarations, in_block=False)
+        return node
+
+    def visit_Block(self, node):
+        node.declarations = self.statements(node.declarations)
+        return node
+
+    def visit_VarDecl(self, node):
+        node.expr_node = self.expr(node.expr_node)
+        return node
+
+    def visit_FuncDecl(self, node):
+        node.block = self.visit(node.block)
+        return node
+
+    def visit_Return(self, node):
+        node.expr_node = self.expr(node.expr_node)
+        return node
+
+    def visit_If(self, node):
+        parts = []
+        for part in [node.if_part] + node.elif_parts:
+            part.condition = self.condition(part.condition)
+            value = self.truth(part.condition)
+            if value is False:
+                continue
+            part.block = self.visit(part.block)
+            if value is True:
+                # 之后的分支都不会执行
+                if not parts:
+                    return part.block
+                node.else_part = parser.Conditional(None, part.block)
+                break
+            parts.append(part)
+        else:
+            if node.else_part:
+                node.else_part.block = self.visit(node.else_part.block)
+
+        if not parts:
+            if node.else_part:
+                return node.else_part.block
+            return None
+        node.if_part = parts[0]
+        node.elif_parts = parts[1:]
+        return node
+
+    def visit_While(self, node):
+        node.condition = self.condition(node.condition)
+        if self.truth(node.condition) is False:
+            return None
+        node.block = self.visit(node.block)
+        return node
+
+    def visit_For(self, node):
+        node.init = self.expr(node.init)
+        node.cond = self.condition(node.cond)
+        if self.truth(node.cond) is False:
+            # init 仍然需要执行
+            return node.init
+        node.incr = self.expr(node.incr)
+        node.block = self.visit(node.block)
+        return node
+
+    def visit_RangeFor(self, node):
+        node.iterable = self.expr(node.iterable)
+        node.block = self.visit(node.block)
+        return node
+
+    def visit_Assign(self, node):
+        node.left = self.visit(node.left)
+        node.expr = self.expr(node.expr)
+        return node
+
+    def visit_FunctionCall(self, node):
+        node.func = self.visit(node.func)
+        node.arguments = [self.expr(arg) for arg in node.arguments]
+        return node
+
+    def visit_ArrayAccess(self, node):
+        node.node = self.visit(node.node)
+        node.index = self.expr(node.index)
+        return node
+
+    def visit_Array(self, node):
+        node.elements = [self.expr(elem) for elem in node.elements]
+        return node
+
+    def visit_Expr(self, node):
+        node.expr_node = self.expr(node.expr_node)
+        # 括号中的字面量不需要保留括号
+        if constant(node.expr_node) is not NotConstant:
+            return node.expr_node
+        return node
+
+    def arith(self, node):
+        node.left = self.expr(node.left)
+        node.right = self.expr(node.right)
+        left = constant(node.left)
+        right = constant(node.right)
+        if not (is_number(left) and is_number(right)):
+            return node
+        try:
+            value = arith_funcs[type(node)](left, right)
+        except ArithmeticError:
+            # 除零等错误留到运行时报告
+            return node
+        if isinstance(value, float) and not math.isfinite(value):
+            return node
+        return number(value)
+
+    visit_Add = arith
+    visit_Sub = arith
+    visit_Mul = arith
+    visit_Div = arith
+    visit_Mod = arith
+
+    def visit_Negative(self, node):
+        node.node = self.expr(node.node)
+        value = constant(node.node)
+        if is_number(value):
+            return number(-value)
+        return node
+
+    def compare(self, node):
+        """比较运算的结果, 无法确定时返回 NotConstant"""
+        left = constant(node.left)
+        right = constant(node.right)
+        if left is NotConstant or right is NotConstant:
+            return NotConstant
+        if node.op_type not in compare_funcs:
+            return NotConstant
+        try:
+            return compare_funcs[node.op_type](left, right)
+        except TypeError:
+            # 如 1 < "a", 留到运行时报错
+            return NotConstant
+
+    def visit_Compare(self, node):
+        node.left = self.expr(node.left)
+        node.right = self.expr(node.right)
+        return node
+
+    def logic(self, node):
+        node.left = self.condition(node.left)
+        node.right = self.condition(node.right)
+        left = self.truth(node.left)
+        right = self.truth(node.right)
+        # && 和 || 总是计算两个操作数, 只有两边都是常量时才能折叠
+        if left is None or right is None:
+            return node
+        if isinstance(node, parser.And):
+            return boolean(left and right)
+        return boolean(left or right)
+
+    visit_And = logic
+    visit_Or = logic
+
+    def visit_Not(self, node):
+        node.node = self.condition(node.node)
+        value = self.truth(node.node)
+        if value is None:
+            return node
+        return boolean(not value)
+
+    def leaf(self, node):
+        return node
+
+    visit_Identifier = leaf
+    visit_Number = leaf
+    visit_String = leaf
+    visit__True = leaf
+    visit__False = leaf
+    visit_Nil = leaf
+    visit_Break = leaf
+    visit_Continue = leaf
+    visit_Comment = leaf
@@ -1,3 +1,4 @@
+import functools
 from typing import List
 from typing import Union
 
@@ -7,36 +8,62 @@ from lexer import TokenType
 
 
 class Node:
-    pass
+    __slots__ = ()
+
+
+@functools.cache
+def field_names(cls):
+    """节点类的所有属性名, 即各级父类和自身的 __slots__"""
+    names = []
+    for klass in reversed(cls.__mro__):
+        names.extend(klass.__dict__.get("__slots__", ()))
+    return tuple(names)
 
 
 class Identifier(Node):
+    __slots__ = ("token", "depth", "slot")
+
     def __init__(self, token):
         self.token = token
+        # 变量的坐标, 由 Resolver 设置
+        self.depth = None
+        self.slot = None
 
 
 class Comment(Node):
+    __slots__ = ("token",)
+
     def __init__(self, token):
         self.token = token
 
 
 class Return(Node):
+    __slots__ = ("expr_node", "tail_call")
+
     def __init__(self, expr_node):
         self.expr_node = expr_node
+        # 返回值是否为用户函数的调用 (尾调用), 由 Resolver 设置
+        self.tail_call = False
 
 
 class Expr(Node):
+    __slots__ = ("expr_node",)
+
     def __init__(self, expr_node):
         self.expr_node = expr_node
 
 
 class Conditional(Node):
+    __slots__ = ("condition", "block")
+
     def __init__(self, condition, block):
         self.condition = condition
         self.block = block
 
 
 class If(Node):
+    __slots__ = ("if_part", "elif_parts", "else_part")
+
     def __init__(self, if_part, elif_parts, else_part):
         self.if_part = if_part
         self.elif_parts = elif_parts
@@ -44,12 +71,16 @@ class If(Node):
 
 
 class While(Node):
+    __slots__ = ("condition", "block")
+
     def __init__(self, condition, block):
         self.condition = condition
         self.block = block
 
 
 class RangeFor(Node):
+    __slots__ = ("var", "iterable", "block")
+
     def __init__(self, var: Identifier, iterable, block):
         self.var = var
         self.iterable = iterable
@@ -57,6 +88,8 @@ class RangeFor(Node):
 
 
 class For(Node):
+    __slots__ = ("init", "cond", "incr", "block")
+
     def __init__(self, init, cond, incr, block):
         self.init = init
         self.cond = cond
@@ -65,55 +98,82 @@ class For(Node):
 
 
 class Continue(Node):
-    pass
+    __slots__ = ()
 
 
 class Break(Node):
-    pass
+    __slots__ = ()
 
 
 class Assign(Node):
+    __slots__ = ("left", "expr")
+
     def __init__(self, left, expr):
         self.left = left
         self.expr = expr
 
 
 class Program(Node):
+    __slots__ = ("declarations", "names")
+
     def __init__(self, declarations: List[Node]):
         self.declarations = declarations
+        # 活动记录中每个 slot 对应的变量名, 由 Resolver 设置
+        self.names = []
 
 
 class Block(Node):
+    __slots__ = ("declarations", "scoped", "names", "captured")
+
     def __init__(self, declarations: List[Node]):
         self.declarations = declarations
+        # 是否需要单独的活动记录, 由 Resolver 设置
+        self.scoped = True
+        self.names = []
+        # 被嵌套函数引用的变量名, 由 Resolver 设置
+        self.captured = []
 
 
 class VarDecl(Node):
+    __slots__ = ("var", "expr_node")
+
     def __init__(self, var: Identifier, expr_node):
         self.var = var
         self.expr_node = expr_node
 
 
 class FuncDecl(Node):
+    __slots__ = ("func", "params", "block", "names", "pure")
+
     def __init__(self, func: Identifier, params: List[Token], block: Block):
         self.func = func
         self.params = params
         self.block = block
+        # 形参, 由 Resolver 设置
+        self.names = []
+        # 由 purity.Purity 设置
+        self.pure = False
 
 
 class Or(Node):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class And(Node):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class Compare(Node):
+    __slots__ = ("left", "right", "op_type")
+
     def __init__(self, left, right, op_type: str):
         self.left = left
         self.right = right
@@ -121,98 +181,149 @@ class Compare(Node):
 
 
 class Add(Node):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class Sub(Node):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class Mul(Node):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class Div(Node):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class Mod(Node):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
 
 
 class Not(Node):
+    __slots__ = ("node",)
+
     def __init__(self, node):
         self.node = node
 
 
 class Negative(Node):
+    __slots__ = ("node",)
+
     def __init__(self, node):
         self.node = node
 
 
 class ArrayAccess(Node):
+    __slots__ = ("node", "index")
+
     def __init__(self, node: Node, index: Node):
         self.node = node
         self.index = index
 
 
 class FunctionCall(Node):
+    __slots__ = (
+        "func",
+        "arguments",
+        "builtin",
+        "global_target",
+        "cache_target",
+        "cache_version",
+    )
+
     def __init__(self, node, arguments):
         self.func = node
         self.arguments = arguments
+        # 调用的是否为内置函数, 由 Resolver 设置; 用户定义的同名函数优先
+        self.builtin = False
+        # 调用的是否为全局函数, 由 Resolver 设置
+        self.global_target = False
+        # Interpreter 的内联缓存
+        self.cache_target = None
+        self.cache_version = None
 
 
 class _True(Node):
-    pass
+    __slots__ = ()
 
 
 class _False(Node):
-    pass
+    __slots__ = ()
 
 
 class Nil(Node):
-    pass
+    __slots__ = ()
 
 
 class Number(Node):
+    __slots__ = ("token", "value")
+
     def __init__(self, token):
         self.token = token
+        # 运行时直接使用 python 的 int/float
+        self.value = token.value
 
 
 class String(Node):
+    __slots__ = ("token",)
+
     def __init__(self, token):
         self.token = token
 
 
 class Array(Node):
+    __slots__ = ("elements",)
+
     def __init__(self, args):
         self.elements = args
 
 
 class Parser:
-    def __init__(self, token_queue):
-        self.token_queue = token_queue
-        self.current_token = self.token_queue.get()
+    def __init__(self, tokens):
+        """tokens 可以是任意 token 的可迭代对象, 比如 Lexer.tokens() 或 Lexer.run()"""
+        self.tokens = iter(tokens)
+        # peek_token 预读的 token
+        self.lookahead = None
+        self.current_token = self.next_token()
+
+    def next_token(self):
+        if self.lookahead is not None:
+            token, self.lookahead = self.lookahead, None
+            return token
+        return next(self.tokens)
 
     def peek_token(self):
-        return self.token_queue.peek()
+        if self.lookahead is None:
+            self.lookahead = next(self.tokens)
+        return self.lookahead
 
     def raise_error(self):
         raise exception.ParserError(f"Parser error. token={self.current_token}")
 
     def eat(self, type):
         if self.current_token.type == type:
-            self.current_token = self.token_queue.get()
+            self.current_token = self.next_token()
         else:
             self.raise_error()
 
@@ -0,0 +1,306 @@
+"""
+y 函数级别的性能分析 (main.py --profile), 只支持 tree 引擎.
+ProfilingInterpreter 在每次执行 y 函数和内置函数时计时, 统计每个函数的
+调用次数, 总耗时 (包括其中调用的其他函数), 自身耗时 (不包括其中调用的其他函数)
+和最大递归深度. 不开启时使用普通的 Interpreter, 没有额外的开销.
+纯函数的缓存命中时不执行函数, 不计入调用次数.
+
+CountingInterpreter 统计执行的操作个数 (main.py --count-ops), 不计时,
+同一个脚本每次的结果都相同, 可以比较解释器的改动是否增加了执行的操作.
+
+Sampler 是开销更小的采样分析 (main.py --sample-profile): 每隔一段 CPU 时间记录一次
+y 的调用栈, 输出 collapsed stack 格式, 可以直接交给 flamegraph.pl 或者 speedscope.
+"""
+import collections
+import json
+import signal
+import time
+
+from interpreter import ARType
+from interpreter import Interpreter
+from interpreter import nil
+from interpreter import Return
+from interpreter import TailCall
+
+
+class FunctionStats:
+    __slots__ = ("name", "calls", "inclusive", "exclusive", "depth", "max_depth")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        # 正在执行的次数, 递归时大于 1
+        self.depth = 0
+        self.max_depth = 0
+
+    def to_json(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "inclusive": self.inclusive,
+            "exclusive": self.exclusive,
+            "max_depth": self.max_depth,
+        }
+
+
+class HookedInterpreter(Interpreter):
+    """
+    与 Interpreter.call 相同, 但是每次执行函数体 (包括尾调用) 都经过 invoke,
+    子类重写 invoke 统计函数调用. 普通的 Interpreter 没有这次额外的方法调用
+    """
+
+    def call(self, f_obj, args):
+        caller = self.current_frame
+        while True:
+            retval = self.invoke(f_obj, args, caller)
+            if retval.__class__ is not TailCall:
+                break
+            f_obj = retval.function
+            args = retval.args
+
+        assert retval is nil or isinstance(retval, Return)
+        if isinstance(retval, Return):
+            return retval.value
+        return retval
+
+    def invoke(self, f_obj, args, caller):
+        """在新的活动记录中执行一次函数体, 返回 Return/TailCall/nil"""
+        new_frame = self.new_frame(
+            f_obj.name,
+            ARType.FUNCTION,
+            caller.nesting_level + 1,
+            f_obj.closure,
+            f_obj.params,
+        )
+        new_frame.slots[: len(args)] = args
+        self.call_stack.push(new_frame)
+        self.current_frame = new_frame
+        retval = self.visit(f_obj.block)
+        self.call_stack.pop()
+        self.current_frame = caller
+        self.release_frame(new_frame)
+        return retval
+
+
+class ProfilingInterpreter(HookedInterpreter):
+    def __init__(self, memo_size=1024):
+        super().__init__(memo_size)
+        # y 函数的函数体 (Block) 或者内置函数名 -> FunctionStats
+        self.functions = {}
+        # 正在执行的函数: [FunctionStats, 开始时间, 其中调用的其他函数的耗时]
+        self.frames = []
+        self.builtins = {
+            name: self.profiled(name, function)
+            for name, function in self.builtins.items()
+        }
+        self.total = 0.0
+
+    def run(self, ast_tree):
+        start = time.perf_counter()
+        try:
+            super().run(ast_tree)
+        finally:
+            self.total = time.perf_counter() - start
+
+    def enter(self, key, name):
+        stats = self.functions.get(key)
+        if stats is None:
+            stats = self.functions[key] = FunctionStats(name)
+        stats.calls += 1
+        stats.depth += 1
+        if stats.depth > stats.max_depth:
+            stats.max_depth = stats.depth
+        self.frames.append([stats, time.perf_counter(), 0.0])
+
+    def leave(self):
+        stats, start, children = self.frames.pop()
+        elapsed = time.perf_counter() - start
+        stats.exclusive += elapsed - children
+        stats.depth -= 1
+        # 递归调用的耗时已经包括在最外层的调用中
+        if stats.depth == 0:
+            stats.inclusive += elapsed
+        if self.frames:
+            self.frames[-1][2] += elapsed
+
+    def invoke(self, f_obj, args, caller):
+        self.enter(f_obj.block, f_obj.name)
+        try:
+            return super().invoke(f_obj, args, caller)
+        finally:
+            self.leave()
+
+    def profiled(self, name, function):
+        """内置函数的计时包装"""
+        label = "<builtin %s>" % name
+
+        def wrapper(args):
+            self.enter(name, label)
+            try:
+                return function(args)
+            finally:
+                self.leave()
+
+        return wrapper
+
+    def sorted_stats(self):
+        """按自身耗时从大到小排序"""
+        return sorted(self.functions.values(), key=lambda s: s.exclusive, reverse=True)
+
+    def report(self):
+        lines = [
+            "total %.6f s" % self.total,
+            "%-24s %10s %12s %12s %9s"
+            % ("function", "calls", "inclusive", "exclusive", "max depth"),
+        ]
+        for stats in self.sorted_stats():
+            lines.append(
+                "%-24s %10d %12.6f %12.6f %9d"
+                % (
+                    stats.name,
+                    stats.calls,
+                    stats.inclusive,
+                    stats.exclusive,
+                    stats.max_depth,
+                )
+            )
+        return lines
+
+    def dump(self, filename):
+        with open(filename, "w") as fp:
+            json.dump(
+                {
+                    "total": self.total,
+                    "functions": [stats.to_json() for stats in self.sorted_stats()],
+                },
+                fp,
+                indent=2,
+            )
+
+
+class CountingInterpreter(HookedInterpreter):
+    def __init__(self, memo_size=1024):
+        super().__init__(memo_size)
+        # 节点类型 -> 求值次数
+        self.nodes = collections.Counter()
+        # 内置函数名 -> 调用次数
+        self.builtin_calls = collections.Counter()
+        # 执行函数体的次数, 包括尾调用, 不包括纯函数的缓存命中
+        self.calls = 0
+        # 函数和 block 使用的活动记录, 以及其中新创建的 (没有从回收的活动记录中取到)
+        self.frames = 0
+        self.allocated_frames = 0
+        self.builtins = {
+            name: self.counted(name, function)
+            for name, function in self.builtins.items()
+        }
+
+    def visit(self, node):
+        self.nodes[node.__class__.__name__] += 1
+        return super().visit(node)
+
+    def invoke(self, f_obj, args, caller):
+        self.calls += 1
+        return super().invoke(f_obj, args, caller)
+
+    def new_frame(self, name, type, nesting_level, outer_space, names):
+        self.frames += 1
+        if not self.free_frames:
+            self.allocated_frames += 1
+        return super().new_frame(name, type, nesting_level, outer_space, names)
+
+    def counted(self, name, function):
+        def wrapper(args):
+            self.builtin_calls[name] += 1
+            return function(args)
+
+        return wrapper
+
+    def summary(self):
+        return {
+            "total": sum(self.nodes.values()),
+            "nodes": dict(sorted_counts(self.nodes)),
+            "builtins": dict(sorted_counts(self.builtin_calls)),
+            "calls": self.calls,
+            "frames": self.frames,
+            "allocated_frames": self.allocated_frames,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+    def report(self):
+        summary = self.summary()
+        lines = ["%-24s %12d" % ("total", summary["total"])]
+        for name, count in summary["nodes"].items():
+            lines.append("%-24s %12d" % (name, count))
+        for name, count in summary["builtins"].items():
+            lines.append("%-24s %12d" % ("<builtin %s>" % name, count))
+        for name in (
+            "calls",
+            "frames",
+            "allocated_frames",
+            "cache_hits",
+            "cache_misses",
+        ):
+            lines.append("%-24s %12d" % ("<%s>" % name, summary[name]))
+        return lines
+
+    def dump(self, filename):
+        with open(filename, "w") as fp:
+            json.dump(self.summary(), fp, indent=2)
+
+
+def sorted_counts(counter):
+    """按次数从大到小, 次数相同时按名字排序, 保证输出稳定"""
+    return sorted(counter.items(), key=lambda item: (-item[1], item[0]))
+
+
+class Sampler:
+    """
+    通过 SIGPROF 定时采样 interpreter.call_stack, 只记录函数的活动记录 (block 的合并到所在的函数),
+    y 脚本不需要任何修改. 用法:
+        with Sampler(interpreter, 0.001) as sampler:
+            interpreter.run(ast)
+        sampler.dump("out.folded")
+    """
+
+    def __init__(self, interpreter, interval=0.001):
+        self.interpreter = interpreter
+        # 采样间隔 (秒, CPU 时间)
+        self.interval = interval
+        # 调用栈 (从外到内的函数名) -> 采样次数
+        self.stacks = collections.Counter()
+        self.previous_handler = None
+
+    def sample(self, signum, frame):
+        stack = tuple(
+            record.name
+            for record in self.interpreter.call_stack
+            if record.type is not ARType.BLOCK
+        )
+        # 还没有开始或者已经结束执行
+        if stack:
+            self.stacks[stack] += 1
+
+    def __enter__(self):
+        self.previous_handler = signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return self
+
+    def __exit__(self, *exc_info):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self.previous_handler)
+
+    def folded(self):
+        """collapsed stack 格式: 每行是 分号分隔的调用栈 和 采样次数"""
+        return [
+            "%s %d" % (";".join(stack), count)
+            for stack, count in sorted(self.stacks.items())
+        ]
+
+    def dump(self, filename):
+        with open(filename, "w") as fp:
+            for line in self.folded():
+                fp.write(line + "\n")
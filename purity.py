@@ -0,0 +1,220 @@
+import parser
+from exception import InterpreterError
+from visitor import NodeVisitor
+
+# 没有副作用的内置函数
+pure_builtins = {"range", "len", "sum", "min", "max", "dot"}
+
+
+class Scope:
+    """与 Resolver 的 Scope 一一对应, 记录直接声明在其中的函数"""
+
+    def __init__(self, declarations=()):
+        # slot -> FuncDecl
+        self.functions = {}
+        # 被赋值或者重复声明的 slot, 其中的函数在运行时可能被替换
+        self.assigned = set()
+        for declaration in declarations:
+            if isinstance(declaration, parser.FuncDecl):
+                slot = declaration.func.slot
+                if slot in self.functions:
+                    self.assigned.add(slot)
+                self.functions[slot] = declaration
+
+
+class Function:
+    def __init__(self, node, level):
+        self.node = node
+        # 函数形参所在的 Scope 在 scopes 中的下标
+        self.level = level
+        self.impure = False
+        # 调用的函数: (Scope, slot)
+        self.callees = []
+
+
+class Purity(NodeVisitor):
+    """
+    纯函数分析, 在 Resolver 之后执行, 结果记录在 FuncDecl.pure 上.
+    纯函数的返回值只由实参决定, 执行时可以缓存结果:
+        只读写自己的形参和局部变量 (不读写全局变量和外层函数的变量)
+        不修改数组的元素, 不调用 print 等有副作用的内置函数
+        只调用纯函数, 且被调用的函数在运行时不会被重新赋值
+    """
+
+    def __init__(self):
+        self.scopes = []
+        # 正在分析的函数, 最内层的在最后
+        self.functions = []
+        # FuncDecl -> Function
+        self.results = {}
+
+    def run(self, program):
+        self.visit(program)
+        # 迭代直到不动点: 调用了非纯函数的函数也不是纯函数
+        changed = True
+        while changed:
+            changed = False
+            for function in self.results.values():
+                if not function.impure and not all(
+                    self.is_pure(scope, slot) for scope, slot in function.callees
+                ):
+                    function.impure = True
+                    changed = True
+        for function in self.results.values():
+            function.node.pure = not function.impure
+        return program
+
+    def is_pure(self, scope, slot):
+        if slot in scope.assigned or slot not in scope.functions:
+            return False
+        return not self.results[scope.functions[slot]].impure
+
+    def visit_Unknown(self, node):
+        raise InterpreterError("Cannot analyze `%s`" % type(node).__name__)
+
+    def impure(self):
+        if self.functions:
+            self.functions[-1].impure = True
+
+    def is_local(self, identifier):
+        """变量是否属于当前分析的函数"""
+        if identifier.depth is None:
+            return False
+        return identifier.depth < len(self.scopes) - self.functions[-1].level
+
+    def scope_of(self, identifier):
+        if identifier.depth is None:
+            return None
+        return self.scopes[-1 - identifier.depth]
+
+    def visit_Program(self, node):
+        self.scopes.append(Scope(node.declarations))
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.scopes.pop()
+
+    def visit_Block(self, node):
+        if not node.scoped:
+            for declaration in node.declarations:
+                self.visit(declaration)
+            return
+        self.scopes.append(Scope(node.declarations))
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.scopes.pop()
+
+    def visit_VarDecl(self, node):
+        if node.expr_node:
+            self.visit(node.expr_node)
+        # 与函数同名的变量会覆盖函数
+        self.scopes[-1].assigned.add(node.var.slot)
+
+    def visit_FuncDecl(self, node):
+        function = Function(node, len(self.scopes))
+        self.results[node] = function
+
+        self.functions.append(function)
+        self.scopes.append(Scope())
+        self.visit(node.block)
+        self.scopes.pop()
+        self.functions.pop()
+
+    def visit_Identifier(self, node):
+        if self.functions and not self.is_local(node):
+            self.impure()
+
+    def visit_Assign(self, node):
+        self.visit(node.expr)
+        if isinstance(node.left, parser.Identifier):
+            scope = self.scope_of(node.left)
+            if scope is not None:
+                scope.assigned.add(node.left.slot)
+            self.visit(node.left)
+        else:
+            # 修改数组的元素
+            self.impure()
+            self.visit(node.left)
+
+    def visit_FunctionCall(self, node):
+        for arg in node.arguments:
+            self.visit(arg)
+        if not self.functions:
+            return
+        func = node.func
+        if not isinstance(func, parser.Identifier):
+            self.visit(func)
+            self.impure()
+        elif node.builtin:
+            if func.token.value not in pure_builtins:
+                self.impure()
+        elif func.depth is None:
+            self.impure()
+        else:
+            self.functions[-1].callees.append((self.scope_of(func), func.slot))
+
+    def visit_Return(self, node):
+        self.visit(node.expr_node)
+
+    def visit_If(self, node):
+        for part in [node.if_part] + node.elif_parts:
+            self.visit(part.condition)
+            self.visit(part.block)
+        if node.else_part:
+            self.visit(node.else_part.block)
+
+    def visit_While(self, node):
+        self.visit(node.condition)
+        self.visit(node.block)
+
+    def visit_For(self, node):
+        self.visit(node.init)
+        self.visit(node.cond)
+        self.visit(node.incr)
+        self.visit(node.block)
+
+    def visit_RangeFor(self, node):
+        self.visit(node.iterable)
+        self.scopes[-1].assigned.add(node.var.slot)
+        self.visit(node.block)
+
+    def visit_ArrayAccess(self, node):
+        self.visit(node.node)
+        self.visit(node.index)
+
+    def visit_Array(self, node):
+        for elem in node.elements:
+            self.visit(elem)
+
+    def visit_Expr(self, node):
+        self.visit(node.expr_node)
+
+    def visit_Not(self, node):
+        self.visit(node.node)
+
+    def visit_Negative(self, node):
+        self.visit(node.node)
+
+    def binary(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+
+    visit_Add = binary
+    visit_Sub = binary
+    visit_Mul = binary
+    visit_Div = binary
+    visit_Mod = binary
+    visit_Compare = binary
+    visit_And = binary
+    visit_Or = binary
+
+    def leaf(self, node):
+        pass
+
+    visit_Number = leaf
+    visit_String = leaf
+    visit__True = leaf
+    visit__False = leaf
+    visit_Nil = leaf
+    visit_Break = leaf
+    visit_Continue = leaf
+    visit_Comment = leaf
@@ -0,0 +1,252 @@
+import parser
+from exception import InterpreterError
+from interpreter import builtin_functions
+from visitor import NodeVisitor
+
+
+class Scope:
+    """与运行时的 ActivationRecord 一一对应"""
+
+    def __init__(self, name, function=False):
+        self.name = name
+        # 是否为函数的形参作用域
+        self.function = function
+        # name -> slot
+        self.slots = {}
+        # slot -> name
+        self.names = []
+        # 被嵌套函数引用的变量名
+        self.captured = set()
+
+    def declare(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.names)
+            self.names.append(name)
+        return self.slots[name]
+
+
+def declares(declaration):
+    """语句是否在当前作用域中声明变量"""
+    if isinstance(declaration, (parser.VarDecl, parser.FuncDecl, parser.RangeFor)):
+        return True
+    return isinstance(declaration, parser.For) and isinstance(
+        declaration.init, parser.VarDecl
+    )
+
+
+class Resolver(NodeVisitor):
+    """
+    语义分析: 在执行前把变量名解析为 (depth, slot) 坐标.
+    depth 是从当前活动记录沿 outer_space 向外的层数, slot 是变量在该活动记录中的下标.
+    结果直接记录在 AST 节点上:
+        Identifier.depth / Identifier.slot  (depth 为 None 表示未定义)
+        Program.names / Block.names         (活动记录中每个 slot 对应的变量名)
+        Block.scoped                        (没有声明变量的 block 不创建活动记录)
+        Block.captured                      (被嵌套函数引用的变量名)
+        FunctionCall.builtin                (调用的是否为内置函数)
+        FuncDecl.names                      (函数形参)
+    """
+
+    def __init__(self):
+        self.scopes = []
+        self.in_function = False
+        # 未定义的变量不会立即报错 (可能位于不会执行的代码中), 由调用者决定如何处理
+        self.warnings = []
+
+    def run(self, program):
+        self.visit(program)
+        return program
+
+    def declare(self, identifier):
+        identifier.depth = 0
+        identifier.slot = self.scopes[-1].declare(identifier.token.value)
+
+    def lookup(self, name):
+        """返回 (depth, slot), 未定义时返回 None"""
+        for depth, scope in enumerate(reversed(self.scopes)):
+            if name in scope.slots:
+                return depth, scope.slots[name]
+        return None
+
+    def resolve(self, identifier, message="Identifier `%s` is not defined"):
+        name = identifier.token.value
+        location = self.lookup(name)
+        if location is not None:
+            identifier.depth, identifier.slot = location
+            inner = self.scopes[len(self.scopes) - identifier.depth :]
+            if any(scope.function for scope in inner):
+                # 在嵌套函数中引用外层的变量
+                self.scopes[-1 - identifier.depth].captured.add(name)
+            return
+
+        identifier.depth = None
+        identifier.slot = None
+        message = message % name
+        if message not in self.warnings:
+            self.warnings.append(message)
+
+    def visit_Unknown(self, node):
+        raise InterpreterError("Cannot resolve `%s`" % type(node).__name__)
+
+    def visit_Program(self, node):
+        scope = Scope("main")
+        # 顶层声明的变量和函数是全局变量, 允许在声明之前的函数体中引用
+        for declaration in node.declarations:
+            if isinstance(declaration, parser.VarDecl):
+                scope.declare(declaration.var.token.value)
+            elif isinstance(declaration, parser.FuncDecl):
+                scope.declare(declaration.func.token.value)
+            elif isinstance(declaration, parser.RangeFor):
+                scope.declare(declaration.var.token.value)
+            elif isinstance(declaration, parser.For) and isinstance(
+                declaration.init, parser.VarDecl
+            ):
+                scope.declare(declaration.init.var.token.value)
+
+        self.scopes.append(scope)
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.scopes.pop()
+        node.names = scope.names
+
+    def visit_Block(self, node):
+        if not any(declares(declaration) for declaration in node.declarations):
+            # 在外层的作用域中执行, 其中的变量少一层 depth
+            node.scoped = False
+            node.names = []
+            for declaration in node.declarations:
+                self.visit(declaration)
+            return
+
+        scope = Scope("<block>")
+        self.scopes.append(scope)
+        for declaration in node.declarations:
+            self.visit(declaration)
+        self.scopes.pop()
+        node.names = scope.names
+        node.captured = [name for name in scope.names if name in scope.captured]
+
+    def visit_VarDecl(self, node):
+        if node.expr_node:
+            self.visit(node.expr_node)
+        self.declare(node.var)
+
+    def visit_FuncDecl(self, node):
+        # 先声明函数名, 函数体中可以递归调用
+        self.declare(node.func)
+
+        scope = Scope(node.func.token.value, function=True)
+        for param in node.params:
+            scope.declare(param.value)
+        node.names = scope.names
+
+        in_function = self.in_function
+        self.in_function = True
+        self.scopes.append(scope)
+        self.visit(node.block)
+        self.scopes.pop()
+        self.in_function = in_function
+
+    def visit_Identifier(self, node):
+        self.resolve(node)
+
+    def visit_Assign(self, node):
+        self.visit(node.expr)
+        if isinstance(node.left, parser.Identifier):
+            self.resolve(node.left, "Assign to an unknown variable `%s`")
+        else:
+            self.visit(node.left)
+
+    def visit_FunctionCall(self, node):
+        if isinstance(node.func, parser.Identifier):
+            name = node.func.token.value
+            # 没有同名的变量或者函数时才调用内置函数
+            node.builtin = name in builtin_functions and self.lookup(name) is None
+            if not node.builtin:
+                self.resolve(node.func, "Function `%s` is not defined")
+                node.global_target = node.func.depth == len(self.scopes) - 1
+        else:
+            self.visit(node.func)
+        for arg in node.arguments:
+            self.visit(arg)
+
+    def visit_Return(self, node):
+        if not self.in_function:
+            raise InterpreterError("`return` outside function")
+        self.visit(node.expr_node)
+        call = node.expr_node
+        node.tail_call = (
+            isinstance(call, parser.FunctionCall)
+            and isinstance(call.func, parser.Identifier)
+            and not call.builtin
+        )
+
+    def visit_If(self, node):
+        for part in [node.if_part] + node.elif_parts:
+            self.visit(part.condition)
+            self.visit(part.block)
+        if node.else_part:
+            self.visit(node.else_part.block)
+
+    def visit_While(self, node):
+        self.visit(node.condition)
+        self.visit(node.block)
+
+    def visit_For(self, node):
+        self.visit(node.init)
+        self.visit(node.cond)
+        self.visit(node.incr)
+        self.visit(node.block)
+
+    def visit_RangeFor(self, node):
+        self.visit(node.iterable)
+        # 循环变量保存在当前活动记录中, 循环结束后不可见
+        scope = self.scopes[-1]
+        name = node.var.token.value
+        declared = name in scope.slots
+        self.declare(node.var)
+        self.visit(node.block)
+        if not declared:
+            del scope.slots[name]
+
+    def visit_ArrayAccess(self, node):
+        self.visit(node.node)
+        self.visit(node.index)
+
+    def visit_Array(self, node):
+        for elem in node.elements:
+            self.visit(elem)
+
+    def visit_Expr(self, node):
+        self.visit(node.expr_node)
+
+    def visit_Not(self, node):
+        self.visit(node.node)
+
+    def visit_Negative(self, node):
+        self.visit(node.node)
+
+    def binary(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+
+    visit_Add = binary
+    visit_Sub = binary
+    visit_Mul = binary
+    visit_Div = binary
+    visit_Mod = binary
+    visit_Compare = binary
+    visit_And = binary
+    visit_Or = binary
+
+    def leaf(self, node):
+        pass
+
+    visit_Number = leaf
+    visit_String = leaf
+    visit__True = leaf
+    visit__False = leaf
+    visit_Nil = leaf
+    visit_Break = leaf
+    visit_Continue = leaf
+    visit_Comment = leaf
@@ -0,0 +1,174 @@
+import re
+
+import exception
+import lexer
+from lexer import keyword_dict
+from lexer import Token
+from lexer import TokenType
+from util import Queue
+
+# 操作符 -> token 类型, 两个字符的操作符必须排在前面
+operators = {
+    "<=": TokenType.LESS_EQUAL,
+    ">=": TokenType.GREATER_EQUAL,
+    "!=": TokenType.NOT_EQUAL,
+    "==": TokenType.EQUAL,
+    "&&": TokenType.AND,
+    "||": TokenType.OR,
+    "+": TokenType.PLUS,
+    "-": TokenType.MINUS,
+    "*": TokenType.MUL,
+    "/": TokenType.DIV,
+    "%": TokenType.MOD,
+    "(": TokenType.L_PAREN,
+    ")": TokenType.R_PAREN,
+    "[": TokenType.L_SQUARE,
+    "]": TokenType.R_SQUARE,
+    "{": TokenType.L_CURLY,
+    "}": TokenType.R_CURLY,
+    "<": TokenType.LESS,
+    ">": TokenType.GREATER,
+    "=": TokenType.ASSIGN,
+    "!": TokenType.NOT,
+    ",": TokenType.COMMA,
+    ":": TokenType.COLON,
+    ";": TokenType.SEMICOLON,
+}
+
+# 关键字和操作符 -> token 类型, 其余的单词都是标识符
+token_types = dict(keyword_dict, **operators)
+
+# 每次匹配一个 token 以及它前面的空白. 各个分支的首字符互不相同, 按出现频率排列;
+# 换行单独匹配, 下一个 token 之前需要处理空行和缩进;
+# 最后两个分支保证任何字符都能被匹配, finditer 不会跳过无法识别的字符
+master_pattern = re.compile(
+    r"""
+    [^\S\n]*(?:
+        (?P<word>[^\W\d]\w*|%s)
+        |(?P<float>\d+\.\d*)
+        |(?P<int>\d+)
+        |(?P<newline>\n)
+        |(?P<string>"[^"]*"?)
+        |(?P<comment>\#[^\n]*\n?)
+    )
+    |(?P<space>[^\S\n]+)
+    |(?P<error>[\s\S])
+    """
+    % "|".join(re.escape(op) for op in operators),
+    re.VERBOSE,
+)
+
+indent_pattern = re.compile(" *")
+
+
+def skip_blanklines(text, pos):
+    """跳过空行, 返回新的位置. 与 Lexer.skip_blanklines 的行为保持一致 (包括 index 不归零)"""
+    index = 0
+    while pos < len(text):
+        peek_pos = pos + index
+        char = text[peek_pos] if peek_pos < len(text) else None
+        if char == "\n":
+            index += 1
+            pos += index
+            continue
+        elif char != None and char.isspace():
+            index += 1
+        else:
+            break
+    return pos
+
+
+class Scanner:
+    """
+    基于正则表达式的词法分析器, 生成的 token 与 Lexer 完全一致.
+    所有 token 由一个预先编译的正则表达式匹配, 每次匹配得到一个完整的 token,
+    不需要逐个字符判断和拼接.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.token_queue = Queue()
+        # 控制缩进, 表示当前缩进级别
+        self.indent_stack = [0]
+
+    def run(self):
+        """执行结束返回token列表"""
+        for token in self.tokens():
+            self.token_queue.put(token)
+
+        return self.token_queue
+
+    def tokens(self):
+        """逐个生成 token, 不需要把所有 token 保存在内存中"""
+        text = self.text
+        length = len(text)
+        indent_stack = self.indent_stack
+        finditer = master_pattern.finditer
+        match_indent = indent_pattern.match
+        types = token_types
+        ID = TokenType.ID
+        NUMBER = TokenType.NUMBER
+        skip_comment = lexer.skip_comment
+
+        pos = 0
+        while pos < length:
+            # 行首: 跳过空行, 处理缩进
+            if pos > 0 and text[pos - 1] == "\n":
+                if text[pos].isspace():
+                    pos = skip_blanklines(text, pos)
+                if text[pos - 1] == "\n":
+                    end = match_indent(text, pos).end()
+                    indent_len = end - pos
+                    pos = end
+                    # 反缩进(可能有多个)
+                    while indent_len < indent_stack[-1]:
+                        indent_stack.pop()
+                        yield Token(TokenType.DEDENT)
+
+                    # 缩进
+                    if indent_len > indent_stack[-1]:
+                        indent_stack.append(indent_len)
+                        yield Token(TokenType.INDENT, "▇" * indent_len)
+                if pos >= length:
+                    break
+
+            # 一直匹配到行尾, 或者下一个 token 的位置需要特殊处理
+            for m in finditer(text, pos):
+                kind = m.lastgroup
+                if kind == "word":
+                    value = m.group(kind)
+                    yield Token(types.get(value, ID), value)
+                elif kind == "int":
+                    yield Token(NUMBER, int(m.group(kind)))
+                elif kind == "newline":
+                    pos = m.end()
+                    break
+                elif kind == "float":
+                    # Lexer 会额外跳过浮点数后面的一个字符
+                    pos = m.end() + 1
+                    yield Token(NUMBER, float(m.group(kind)))
+                    break
+                elif kind == "string":
+                    value = m.group(kind)
+                    if len(value) == 1 or value[-1] != '"':
+                        # 没有结束的引号
+                        value += '"'
+                    yield Token(TokenType.STRING, value)
+                elif kind == "comment":
+                    value = m.group(kind)
+                    pos = m.end()
+                    if value[-1] == "\n":
+                        value = value[:-1]
+                    else:
+                        pos += 1
+                    if not skip_comment:
+                        yield Token(TokenType.COMMENT, value)
+                    break
+                elif kind == "error":
+                    raise exception.LexerError(f"Lexer error. '{m.group(kind)}'")
+            else:
+                pos = length
+
+        while indent_stack.pop():
+            yield Token(TokenType.DEDENT)
+        yield Token(TokenType.EOF, "EOF")
@@ -0,0 +1,96 @@
+"""transpiler 生成的 python 代码在运行时依赖的值和函数"""
+import types
+
+from exception import InterpreterError
+from interpreter import And
+from interpreter import Array
+from interpreter import builtin_functions
+from interpreter import false
+from interpreter import function_callers
+from interpreter import is_number
+from interpreter import nil
+from interpreter import Not
+from interpreter import Or
+from interpreter import Range
+from interpreter import String
+from interpreter import TailCall
+from interpreter import true
+from interpreter import truthy
+
+__all__ = [
+    "And",
+    "Array",
+    "builtin_functions",
+    "false",
+    "nil",
+    "Not",
+    "Or",
+    "String",
+    "TailCall",
+    "true",
+    "truthy",
+    "subscr",
+    "store_subscr",
+    "unknown_variable",
+    "undefined_variable",
+    "Cell",
+    "trampoline",
+]
+
+
+def subscr(array, index):
+    assert isinstance(array, (Array, Range))
+    assert is_number(index)
+    assert index < len(array.elements)
+    return array.elements[index]
+
+
+def store_subscr(array, index, value):
+    assert isinstance(array, Array)
+    assert is_number(index)
+    assert index < len(array.elements)
+    array.store(index, value)
+
+
+def unknown_variable(name, value):
+    """给未声明的变量赋值, 与 Interpreter 一致在执行到时报错"""
+    raise InterpreterError("Assign to an unknown variable `%s`" % name)
+
+
+def trampoline(body):
+    """
+    包装有尾调用的函数: body 返回 TailCall 时在这里继续执行被调用的函数,
+    被调用的函数也是 trampoline 时直接执行它的 body, 不增加 python 栈的深度
+    """
+
+    def function(*args):
+        result = body(*args)
+        while result.__class__ is TailCall:
+            callee = result.function
+            result = getattr(callee, "tail_body", callee)(*result.args)
+        return result
+
+    function.tail_body = body
+    return function
+
+
+def undefined_variable(name):
+    """读取未定义的变量或者缺少的形参"""
+    raise InterpreterError("Identifier `%s` is not defined" % name)
+
+
+class Cell:
+    """被嵌套函数引用的 block 变量, 每次执行 block 时创建"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def call_function(function, args):
+    return function(*args)
+
+
+# 转换得到的 y 函数是普通的 python 函数, 供 bench() 调用
+function_callers[types.FunctionType] = call_function
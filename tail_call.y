@@ -0,0 +1,7 @@
+# 尾调用不会增加调用栈的深度
+func countdown(n):
+    if n == 0:
+        return "done"
+    return countdown(n - 1)
+
+print(countdown(1000000))
@@ -0,0 +1,569 @@
+import collections
+import linecache
+import re
+
+import parser
+from exception import InterpreterError
+from interpreter import builtin_functions
+from visitor import NodeVisitor
+
+compare_ops = ("<", "<=", ">", ">=", "==", "!=")
+
+arith_ops = {
+    parser.Add: "+",
+    parser.Sub: "-",
+    parser.Mul: "*",
+    parser.Div: "/",
+    parser.Mod: "%",
+}
+
+# 生成 python 语句的节点, 其余节点生成 python 表达式
+statements = (
+    parser.VarDecl,
+    parser.FuncDecl,
+    parser.If,
+    parser.While,
+    parser.For,
+    parser.RangeFor,
+    parser.Break,
+    parser.Continue,
+    parser.Return,
+    parser.Comment,
+)
+
+
+def walk(node):
+    """遍历 node 及其所有子节点"""
+    yield node
+    for name in parser.field_names(node.__class__):
+        value = getattr(node, name)
+        if isinstance(value, parser.Node):
+            yield from walk(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, parser.Node):
+                    yield from walk(item)
+
+
+def rebound_names(program):
+    """被赋值或者多次声明的变量名, 这些名字对应的函数在运行时可能被替换"""
+    counts = collections.Counter()
+    for node in walk(program):
+        if isinstance(node, parser.FuncDecl):
+            counts[node.func.token.value] += 1
+        elif isinstance(node, (parser.VarDecl, parser.RangeFor)):
+            counts[node.var.token.value] += 1
+        elif isinstance(node, parser.Assign) and isinstance(
+            node.left, parser.Identifier
+        ):
+            counts[node.left.token.value] += 2
+    return {name for name, count in counts.items() if count > 1}
+
+
+class Scope:
+    def __init__(self, function, cells=()):
+        # y 变量名 -> python 变量名
+        self.names = {}
+        # 作用域所属的 python 函数, None 表示模块顶层
+        self.function = function
+        # 保存在 Cell 中的变量 (Block.captured): 每次执行 block 都创建新的 Cell,
+        # 循环中每次迭代定义的函数通过默认参数引用各自的 Cell
+        self.cells = set(cells)
+
+
+class FunctionInfo:
+    def __init__(self, name, params=(), y_name=None, scope=None):
+        self.name = name
+        self.params = params
+        # 函数自身的 y 名字及其所在的作用域, 用于识别尾部的递归调用;
+        # y_name 为 None 表示不能把递归调用转换为循环
+        self.y_name = y_name
+        self.scope = scope
+        self.tail_calls = False
+        # 是否有对其他函数的尾调用, 需要通过 trampoline 执行
+        self.trampoline = False
+        # 函数内用到的 python 变量名, 用于块作用域变量重命名
+        self.used = set()
+        self.globals = set()
+        self.nonlocals = set()
+
+
+class Transpiler(NodeVisitor):
+    """
+    将 AST 转换为等价的 python 源码.
+    y 的全局变量加上 `y_` 前缀, 函数的形参和局部变量加上 `l_` 前缀,
+    避免与 python 关键字和运行时名字冲突; 块作用域中的同名变量会被重命名为
+    `l_name_N`.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.level = 0
+        self.scopes = []
+        self.function = None
+        self.module_names = set()
+        # 字面量常量, 在模块顶层只创建一次
+        self.consts = {}
+        self.const_lines = []
+        self.builtins = set()
+        # 当前所在的循环, For 循环在 continue 前需要执行 incr
+        self.loops = []
+        self.rebound = set()
+
+    def transpile(self, program):
+        self.rebound = rebound_names(program)
+        self.visit(program)
+        header = [
+            "# generated by y transpiler",
+            "from support import *",
+            "",
+        ]
+        return "\n".join(header + self.const_lines + [""] + self.lines) + "\n"
+
+    def emit(self, line):
+        self.lines.append("    " * self.level + line)
+
+    def const(self, expr):
+        if expr not in self.consts:
+            name = "_k%d" % len(self.consts)
+            self.consts[expr] = name
+            self.const_lines.append("%s = %s" % (name, expr))
+        return self.consts[expr]
+
+    def resolve(self, name):
+        """返回 (python 变量名, 所属作用域), 未声明的变量视为全局变量"""
+        for scope in reversed(self.scopes):
+            if name in scope.names:
+                return scope.names[name], scope
+        return "y_" + name, None
+
+    def declare(self, name):
+        if self.function is None:
+            used = self.module_names
+            py_name = "y_" + name
+        else:
+            # 局部变量使用不同的前缀, 不会遮蔽同名的全局变量
+            used = self.function.used
+            py_name = "l_" + name
+        if self.scopes and py_name in used:
+            count = 1
+            while "%s_%d" % (py_name, count) in used:
+                count += 1
+            py_name = "%s_%d" % (py_name, count)
+        used.add(py_name)
+        if self.scopes:
+            self.scopes[-1].names[name] = py_name
+        return py_name
+
+    def is_cell(self, name):
+        _, scope = self.resolve(name)
+        return scope is not None and name in scope.cells
+
+    def target(self, name):
+        """赋值目标, 必要时为当前函数添加 global / nonlocal 声明"""
+        py_name, scope = self.resolve(name)
+        if self.function is not None:
+            if scope is None or scope.function is None:
+                self.function.globals.add(py_name)
+            elif scope.function is not self.function:
+                self.function.nonlocals.add(py_name)
+        return py_name
+
+    def body(self, declarations):
+        start = len(self.lines)
+        self.level += 1
+        for declaration in declarations:
+            self.statement(declaration)
+        if len(self.lines) == start:
+            self.emit("pass")
+        self.level -= 1
+
+    def block(self, node, cells=True):
+        """cells 为 False 时 (函数体每次调用都是新的) 不需要把变量保存在 Cell 中"""
+        self.scopes.append(Scope(self.function, cells=node.captured if cells else ()))
+        self.body(node.declarations)
+        self.scopes.pop()
+
+    def condition(self, node):
+        """条件表达式, 比较运算的结果已经是 bool, 其余的值需要转换"""
+        if isinstance(node, parser.Compare):
+            return self.visit(node)
+        return "truthy(%s)" % self.visit(node)
+
+    def statement(self, node):
+        if isinstance(node, parser.Assign):
+            self.assign(node)
+        elif isinstance(node, parser.Block):
+            self.emit("if True:")
+            self.block(node)
+        elif isinstance(node, statements):
+            self.visit(node)
+        else:
+            self.emit(self.visit(node))
+
+    def visit_Unknown(self, node):
+        raise InterpreterError("Cannot transpile `%s`" % type(node).__name__)
+
+    def visit_Program(self, node):
+        for declaration in node.declarations:
+            self.statement(declaration)
+
+    def visit_Comment(self, node):
+        pass
+
+    def visit_VarDecl(self, node):
+        if node.expr_node:
+            value = self.visit(node.expr_node)
+        else:
+            value = "nil"
+        name = node.var.token.value
+        py_name = self.declare(name)
+        if self.scopes and name in self.scopes[-1].cells:
+            value = "Cell(%s)" % value
+        self.emit("%s = %s" % (py_name, value))
+
+    def visit_FuncDecl(self, node):
+        y_name = node.func.token.value
+        py_name = self.declare(y_name)
+        cell = self.scopes and y_name in self.scopes[-1].cells
+        # 保存在 Cell 中的函数先以另外的名字定义
+        def_name = "_" + py_name if cell else py_name
+        params = ["l_" + param.value for param in node.params]
+        # 外层 block 的 Cell 在定义函数时绑定
+        cells = [
+            cell_name
+            for scope in self.scopes
+            for name, cell_name in scope.names.items()
+            if name in scope.cells
+        ]
+
+        # 循环中每次迭代共享局部变量, 函数体中定义的闭包会看到之后的修改
+        if y_name in self.rebound or any(
+            isinstance(child, parser.FuncDecl) for child in walk(node.block)
+        ):
+            y_name = None
+        scope = self.scopes[-1] if self.scopes else None
+        function = FunctionInfo(def_name, params, y_name, scope)
+        # 嵌套函数中声明的变量不能与外层函数的变量重名
+        for scope in self.scopes:
+            if scope.function is not None:
+                function.used.update(scope.names.values())
+        scope = Scope(function)
+        for param in node.params:
+            scope.names[param.value] = "l_" + param.value
+            function.used.add("l_" + param.value)
+
+        outer = (self.function, self.lines, self.level, self.loops)
+        self.function = function
+        self.lines = []
+        self.level = 0
+        self.loops = []
+        self.scopes.append(scope)
+        self.block(node.block, cells=False)
+        self.scopes.pop()
+        body = self.lines
+        self.function, self.lines, self.level, self.loops = outer
+
+        if cell:
+            self.emit("%s = Cell(nil)" % py_name)
+        # 多余的实参忽略, 缺少的形参为 None
+        signature = ["%s=None" % param for param in params] + ["*_"]
+        signature += ["%s=%s" % (cell_name, cell_name) for cell_name in cells]
+        self.emit("def %s(%s):" % (def_name, ", ".join(signature)))
+        self.level += 1
+        if function.globals:
+            self.emit("global %s" % ", ".join(sorted(function.globals)))
+        if function.nonlocals:
+            self.emit("nonlocal %s" % ", ".join(sorted(function.nonlocals)))
+        for param in params:
+            # 缺少的形参保持未定义, 读取时由 PythonInterpreter 转换为 InterpreterError
+            self.emit("if %s is None:" % param)
+            self.emit("    del %s" % param)
+        if function.tail_calls:
+            # 尾部的递归调用转换为给形参赋值后 continue
+            self.emit("while True:")
+        else:
+            self.level -= 1
+        for line in body:
+            self.emit(line)
+        declarations = node.block.declarations
+        if not declarations or not isinstance(declarations[-1], parser.Return):
+            self.level += 1
+            self.emit("return nil")
+            self.level -= 1
+        if function.tail_calls:
+            self.level -= 1
+        if function.trampoline:
+            self.emit("%s = trampoline(%s)" % (def_name, def_name))
+        if cell:
+            self.emit("%s.value = %s" % (py_name, def_name))
+
+    def self_call(self, node):
+        """node 是否为当前函数在循环之外对自身的尾调用"""
+        function = self.function
+        if not node.tail_call or function.y_name is None or self.loops:
+            return False
+        call = node.expr_node
+        if call.func.token.value != function.y_name:
+            return False
+        py_name, scope = self.resolve(function.y_name)
+        return (
+            py_name == function.name
+            and scope is function.scope
+            and len(call.arguments) >= len(function.params)
+        )
+
+    def visit_Return(self, node):
+        if self.function is None:
+            raise InterpreterError("`return` outside function")
+        if self.self_call(node):
+            args = [self.visit(arg) for arg in node.expr_node.arguments]
+            params = self.function.params
+            # 多余的实参同样需要计算
+            if params:
+                self.emit("%s, *_ = %s," % (", ".join(params), ", ".join(args)))
+            elif args:
+                self.emit("_ = %s," % ", ".join(args))
+            self.emit("continue")
+            self.function.tail_calls = True
+            return
+        if node.tail_call:
+            # 其他的尾调用返回 TailCall, 由调用者所在的 trampoline 执行, 不增加调用栈的深度
+            call = node.expr_node
+            args = [self.visit(arg) for arg in call.arguments]
+            self.emit(
+                "return TailCall(%s, [%s])" % (self.visit(call.func), ", ".join(args))
+            )
+            self.function.trampoline = True
+            return
+        self.emit("return %s" % self.visit(node.expr_node))
+
+    def visit_If(self, node):
+        self.emit("if %s:" % self.condition(node.if_part.condition))
+        self.block(node.if_part.block)
+        for part in node.elif_parts:
+            self.emit("elif %s:" % self.condition(part.condition))
+            self.block(part.block)
+        if node.else_part:
+            self.emit("else:")
+            self.block(node.else_part.block)
+
+    def visit_While(self, node):
+        self.loops.append(None)
+        self.emit("while %s:" % self.condition(node.condition))
+        self.block(node.block)
+        self.loops.pop()
+
+    def visit_For(self, node):
+        self.statement(node.init)
+
+        # incr 在循环体末尾和每个 continue 之前都要执行, 预先生成
+        outer = (self.lines, self.level)
+        self.lines = []
+        self.level = 0
+        self.statement(node.incr)
+        incr = self.lines
+        self.lines, self.level = outer
+
+        self.loops.append(incr)
+        self.emit("while %s:" % self.condition(node.cond))
+        self.block(node.block)
+        self.level += 1
+        for line in incr:
+            self.emit(line)
+        self.level -= 1
+        self.loops.pop()
+
+    def visit_RangeFor(self, node):
+        var_name = node.var.token.value
+        iterable = self.visit(node.iterable)
+        at_top = not self.scopes
+        if not at_top:
+            # 循环变量只在循环内可见
+            self.scopes.append(Scope(self.function))
+        py_name = self.declare(var_name)
+
+        self.loops.append(None)
+        self.emit("for %s in %s:" % (py_name, iterable))
+        self.block(node.block)
+        self.loops.pop()
+
+        if at_top:
+            self.emit("globals().pop(%r, None)" % py_name)
+        else:
+            self.scopes.pop()
+
+    def visit_Break(self, node):
+        if not self.loops:
+            raise InterpreterError("`break` outside loop")
+        self.emit("break")
+
+    def visit_Continue(self, node):
+        if not self.loops:
+            raise InterpreterError("`continue` outside loop")
+        if self.loops[-1] is not None:
+            for line in self.loops[-1]:
+                self.emit(line)
+        self.emit("continue")
+
+    def assign(self, node):
+        value = self.visit(node.expr)
+        if isinstance(node.left, parser.ArrayAccess):
+            self.emit(self.store_subscr(node.left, value))
+        elif node.left.depth is None:
+            self.emit(self.unknown_variable(node.left, value))
+        elif self.is_cell(node.left.token.value):
+            py_name, _ = self.resolve(node.left.token.value)
+            self.emit("%s.value = %s" % (py_name, value))
+        else:
+            self.emit("%s = %s" % (self.target(node.left.token.value), value))
+
+    def store_subscr(self, left, value):
+        return "store_subscr(%s, %s, %s)" % (
+            self.visit(left.node),
+            self.visit(left.index),
+            value,
+        )
+
+    def unknown_variable(self, left, value):
+        # Resolver 没有找到变量的声明
+        return "unknown_variable(%r, %s)" % (left.token.value, value)
+
+    def visit_Assign(self, node):
+        # 作为表达式使用时, 与 Interpreter 一致返回 None
+        value = self.visit(node.expr)
+        if isinstance(node.left, parser.ArrayAccess):
+            return self.store_subscr(node.left, value)
+        if node.left.depth is None:
+            return self.unknown_variable(node.left, value)
+        if self.is_cell(node.left.token.value):
+            py_name, _ = self.resolve(node.left.token.value)
+            return "setattr(%s, 'value', %s)" % (py_name, value)
+        py_name = self.target(node.left.token.value)
+        return "((%s := %s), None)[1]" % (py_name, value)
+
+    def visit_FunctionCall(self, node):
+        args = [self.visit(arg) for arg in node.arguments]
+        if isinstance(node.func, parser.Identifier):
+            f_name = node.func.token.value
+            if node.builtin:
+                native = "_" + f_name
+                if native not in self.builtins:
+                    self.builtins.add(native)
+                    self.const_lines.append(
+                        "%s = builtin_functions[%r]" % (native, f_name)
+                    )
+                return "%s([%s])" % (native, ", ".join(args))
+
+        return "%s(%s)" % (self.visit(node.func), ", ".join(args))
+
+    def visit_Expr(self, node):
+        return "(%s)" % self.visit(node.expr_node)
+
+    def visit_Identifier(self, node):
+        name = node.token.value
+        if node.depth is None:
+            # Resolver 没有找到变量的声明
+            return "undefined_variable(%r)" % name
+        py_name, scope = self.resolve(name)
+        if scope is None:
+            return py_name
+        if name in scope.cells:
+            return py_name + ".value"
+        return py_name
+
+    def visit_Number(self, node):
+        # 数字直接使用 python 的 int/float 字面量
+        return repr(node.value)
+
+    def visit_String(self, node):
+        return self.const("String(%r)" % node.token.value)
+
+    def visit__True(self, node):
+        return "true"
+
+    def visit__False(self, node):
+        return "false"
+
+    def visit_Nil(self, node):
+        return "nil"
+
+    def visit_Array(self, node):
+        elements = [self.visit(elem) for elem in node.elements]
+        return "Array([%s])" % ", ".join(elements)
+
+    def visit_ArrayAccess(self, node):
+        return "subscr(%s, %s)" % (self.visit(node.node), self.visit(node.index))
+
+    def arith(self, node):
+        op = arith_ops[type(node)]
+        return "(%s %s %s)" % (self.visit(node.left), op, self.visit(node.right))
+
+    visit_Add = arith
+    visit_Sub = arith
+    visit_Mul = arith
+    visit_Div = arith
+    visit_Mod = arith
+
+    def visit_Compare(self, node):
+        if node.op_type not in compare_ops:
+            raise InterpreterError("Unknown Compare op_type `%s`" % node.op_type)
+        return "(%s %s %s)" % (
+            self.visit(node.left),
+            node.op_type,
+            self.visit(node.right),
+        )
+
+    def visit_And(self, node):
+        return "And(%s, %s)" % (self.visit(node.left), self.visit(node.right))
+
+    def visit_Or(self, node):
+        return "Or(%s, %s)" % (self.visit(node.left), self.visit(node.right))
+
+    def visit_Not(self, node):
+        return "Not(%s)" % self.visit(node.node)
+
+    def visit_Negative(self, node):
+        return "(-%s)" % self.visit(node.node)
+
+
+def undefined_name(error):
+    """NameError 对应的 y 变量名, 不是 y 变量时返回 None"""
+    name = error.name
+    if name is None:
+        # UnboundLocalError 没有设置 name, 从错误信息中取出
+        match = re.search(r"'(\w+)'", str(error))
+        name = match and match.group(1)
+    if name is None or name[:2] not in ("y_", "l_"):
+        return None
+    return name[2:]
+
+
+class PythonInterpreter:
+    """与 Interpreter 接口一致, 把 AST 转换为 python 代码后交给 CPython 执行"""
+
+    def __init__(self, filename="<y>"):
+        self.filename = filename
+
+    def run(self, ast_tree):
+        self.execute(Transpiler().transpile(ast_tree))
+
+    def execute(self, source):
+        if self.filename.startswith("<"):
+            # 没有写入文件的代码, 让 traceback 能够显示生成的代码行
+            linecache.cache[self.filename] = (
+                len(source),
+                None,
+                source.splitlines(True),
+                self.filename,
+            )
+        code = compile(source, self.filename, "exec")
+        try:
+            exec(code, {"__name__": "__y__"})
+        except NameError as e:
+            # 缺少的形参, 已经删除的全局变量 (如顶层 for-in 的循环变量) 等,
+            # 与其他引擎一致报错
+            name = undefined_name(e)
+            if name is None:
+                raise
+            raise InterpreterError("Identifier `%s` is not defined" % name) from e
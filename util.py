@@ -1,17 +1,18 @@
+from collections import deque
+
+
 class Queue(object):
     """实现queue.Queue的get, put接口, 并额外添加peek方法"""
 
     def __init__(self):
-        self._elements = []
+        self._elements = deque()
 
     def put(self, element):
         self._elements.append(element)
 
     def get(self):
         assert self._elements
-        res = self._elements[0]
-        del self._elements[0]
-        return res
+        return self._elements.popleft()
 
     def peek(self):
         assert self._elements
@@ -20,6 +21,10 @@ class Queue(object):
     def __len__(self):
         return len(self._elements)
 
+    def __iter__(self):
+        """从队首到队尾遍历(不移除)所有元素"""
+        return iter(self._elements)
+
     def __str__(self):
         res = ["Queue:"]
         for idx, element in enumerate(self._elements):
@@ -47,3 +52,7 @@ class Stack(object):
 
     def __len__(self):
         return len(self._elements)
+
+    def __iter__(self):
+        """从栈底到栈顶遍历(不移除)所有元素"""
+        return iter(self._elements)
@@ -0,0 +1,208 @@
+"""
+数组的逐元素运算和归约 (sum/min/max/dot).
+安装了 numpy 时, 足够大的数字数组 (array.array 或者 range) 使用 numpy 计算,
+否则逐个元素用 python 的运算符计算. 两种方式的结果必须完全相同:
+    int 运算可能超出 64 位时, 除数中有 0 时 (需要抛出 ZeroDivisionError),
+    int 和 float 混合比较可能不精确时, 都退回到 python 的计算方式;
+    浮点数的求和与点积在 numpy 中的求和顺序不同, 结果可能有舍入误差, 也不使用 numpy.
+运算的输入和输出都是 list/array.array/range, 由调用者包装为 y 的 Array
+"""
+import operator
+from array import array
+
+from exception import InterpreterError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# 元素个数少于这个值时 numpy 的额外开销比计算本身更大
+threshold = 64
+
+# 转换为 float 时不损失精度的整数范围
+exact_float = 2**53
+int64_max = 2**63 - 1
+
+
+compare_ops = {
+    operator.lt,
+    operator.le,
+    operator.gt,
+    operator.ge,
+    operator.eq,
+    operator.ne,
+}
+
+
+def is_sequence(value):
+    return value.__class__ in (list, array, range)
+
+
+def to_numpy(value):
+    """转换为 numpy 数组, 无法转换时返回 None. 标量原样返回"""
+    cls = value.__class__
+    if cls is int:
+        return value if -int64_max <= value <= int64_max else None
+    if cls is float:
+        return value
+    if cls is array:
+        # 共享 array 的内存, 不复制
+        if value.typecode == "q":
+            return numpy.frombuffer(value, dtype=numpy.int64)
+        return numpy.frombuffer(value, dtype=numpy.float64)
+    if cls is range:
+        if max(abs(value.start), abs(value.stop)) > int64_max:
+            return None
+        return numpy.arange(value.start, value.stop, value.step, dtype=numpy.int64)
+    return None
+
+
+def bound(value):
+    """元素绝对值的上界"""
+    if isinstance(value, (int, float)):
+        return abs(value)
+    if len(value) == 0:
+        return 0
+    return max(-int(value.min()), int(value.max()))
+
+
+def is_int(value):
+    if value.__class__ is int:
+        return True
+    if value.__class__ is float:
+        return False
+    return value.dtype == numpy.int64
+
+
+def has_zero(value):
+    if isinstance(value, (int, float)):
+        return value == 0
+    return bool((value == 0).any())
+
+
+def safe(op, left, right):
+    """numpy 的计算结果与 python 是否一致"""
+    if not (is_int(left) or is_int(right)):
+        # 只有 float: 逐元素的运算都符合 IEEE 754, 与 python 一致
+        return op not in (operator.truediv, operator.mod) or not has_zero(right)
+    if is_int(left) and is_int(right):
+        if op in (operator.add, operator.sub):
+            return bound(left) + bound(right) <= int64_max
+        if op is operator.mul:
+            return bound(left) * bound(right) <= int64_max
+        if op is operator.truediv:
+            return (
+                bound(left) <= exact_float
+                and bound(right) <= exact_float
+                and not has_zero(right)
+            )
+        if op is operator.mod:
+            return not has_zero(right)
+        return True
+    # int 和 float 混合: 运算时 int 转换为 float, 与 python 一致; 比较时 python 的结果是精确的
+    if op in compare_ops:
+        int_side = left if is_int(left) else right
+        if bound(int_side) > exact_float:
+            return False
+    return op not in (operator.truediv, operator.mod) or not has_zero(right)
+
+
+def from_numpy(result):
+    if result.dtype == numpy.int64:
+        return array("q", result.tobytes())
+    if result.dtype == numpy.float64:
+        return array("d", result.tobytes())
+    # 比较的结果, 与单个元素的比较一样是 python 的 bool
+    return result.tolist()
+
+
+def elementwise(op, left, right):
+    """
+    left op right, 至少有一个操作数是序列. 两个序列的长度必须相同,
+    序列和标量运算时标量与每个元素运算
+    """
+    if is_sequence(left) and is_sequence(right):
+        if len(left) != len(right):
+            raise InterpreterError(
+                "Array length mismatch: %d and %d" % (len(left), len(right))
+            )
+        size = len(left)
+    else:
+        size = len(left) if is_sequence(left) else len(right)
+
+    if numpy is not None and size >= threshold:
+        np_left = to_numpy(left)
+        np_right = to_numpy(right)
+        if np_left is not None and np_right is not None and safe(op, np_left, np_right):
+            # inf - inf 等在 python 中得到 nan/inf, 不需要警告
+            with numpy.errstate(all="ignore"):
+                return from_numpy(op(np_left, np_right))
+
+    if not is_sequence(left):
+        return [op(left, elem) for elem in right]
+    if not is_sequence(right):
+        return [op(elem, right) for elem in left]
+    return list(map(op, left, right))
+
+
+def negative(value):
+    if numpy is not None and len(value) >= threshold:
+        np_value = to_numpy(value)
+        # -(-2**63) 超出 64 位
+        if np_value is not None and (
+            not is_int(np_value) or bound(np_value) <= int64_max
+        ):
+            return from_numpy(-np_value)
+    return [-elem for elem in value]
+
+
+def use_numpy(value):
+    """整数数组的归约是否使用 numpy, 返回 numpy 数组或者 None"""
+    if numpy is None or len(value) < threshold:
+        return None
+    value = to_numpy(value)
+    if value is None or value.dtype != numpy.int64:
+        return None
+    return value
+
+
+def vsum(value):
+    values = use_numpy(value)
+    if values is not None and bound(values) * len(values) <= int64_max:
+        return int(values.sum())
+    return sum(value)
+
+
+def vmin(value):
+    if len(value) == 0:
+        raise InterpreterError("min() of an empty array")
+    values = use_numpy(value)
+    if values is not None:
+        return int(values.min())
+    return min(value)
+
+
+def vmax(value):
+    if len(value) == 0:
+        raise InterpreterError("max() of an empty array")
+    values = use_numpy(value)
+    if values is not None:
+        return int(values.max())
+    return max(value)
+
+
+def dot(left, right):
+    if len(left) != len(right):
+        raise InterpreterError(
+            "Array length mismatch: %d and %d" % (len(left), len(right))
+        )
+    np_left = use_numpy(left)
+    np_right = use_numpy(right)
+    if (
+        np_left is not None
+        and np_right is not None
+        and bound(np_left) * bound(np_right) * len(left) <= int64_max
+    ):
+        return int(numpy.dot(np_left, np_right))
+    return sum(map(operator.mul, left, right))
@@ -1,5 +1,27 @@
 class NodeVisitor:
+    """
+    按节点类型分派到 visit_<类名> 方法.
+    每个子类维护一张 节点类型 -> 方法 的分派表, 第一次遇到某种节点时查找并缓存,
+    之后的分派只需要一次字典查找; 没有对应方法的节点分派到 visit_Unknown.
+    """
+
+    _dispatch_table = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch_table = {}
+
     def visit(self, node):
-        fn_name = "visit_" + node.__class__.__name__
-        fn = getattr(self, fn_name, self.visit_Unknown)
-        return fn(node)
+        try:
+            fn = self._dispatch_table[node.__class__]
+        except KeyError:
+            fn = self._lookup(node.__class__)
+        return fn(self, node)
+
+    @classmethod
+    def _lookup(cls, node_class):
+        fn = getattr(cls, "visit_" + node_class.__name__, None)
+        if fn is None:
+            fn = cls.visit_Unknown
+        cls._dispatch_table[node_class] = fn
+        return fn
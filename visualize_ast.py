@@ -10,6 +10,8 @@ from visitor import NodeVisitor
 class VisualizeAST(NodeVisitor):
     def __init__(self):
         self.count = 0
+        # 节点 -> dot 中的编号
+        self.nums = {}
         self.dot_header = [
             textwrap.dedent(
                 """digraph astgraph {
@@ -29,18 +31,18 @@ class VisualizeAST(NodeVisitor):
     def visit_Program(self, node):
         s = '  node%d [label="%s"]\n' % (self.count, type(node).__name__)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for decl in node.declarations:
             self.visit(decl)
-            s = "  node%d -> node%d\n" % (node._num, decl._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[decl])
             self.dot_body.append(s)
 
     def visit_FuncDecl(self, node):
         s = '  node%d [label="Func %s"]\n' % (self.count, node.func.token.value)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         param_count = self.count
@@ -50,24 +52,24 @@ class VisualizeAST(NodeVisitor):
             ",".join([v.value for v in node.params]),
         )
         self.dot_body.append(s)
-        s = "  node%d -> node%d\n" % (node._num, param_count)
+        s = "  node%d -> node%d\n" % (self.nums[node], param_count)
         self.dot_body.append(s)
 
         # for child in (node.params, node.block):
         for child in (node.block,):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Block(self, node):
         s = '  node%d [label="Block"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for decl in node.declarations:
             self.visit(decl)
-            s = "  node%d -> node%d\n" % (node._num, decl._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[decl])
             self.dot_body.append(s)
 
     def visit_FunctionCall(self, node):
@@ -99,44 +101,44 @@ class VisualizeAST(NodeVisitor):
         args = ",".join(args)
         s = '  node%d [label="%s(%s)"]\n' % (self.count, fname, args)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         # for arg in node.arguments:
         #    self.visit(arg)
-        #    s = '  node%d -> node%d\n' % (node._num, arg._num)
+        #    s = '  node%d -> node%d\n' % (self.nums[node], self.nums[arg])
         #    self.dot_body.append(s)
 
     def visit_VarDecl(self, node):
         s = '  node%d [label="Var %s"]\n' % (self.count, node.var.token.value)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         self.visit(node.expr_node)
-        s = "  node%d -> node%d\n" % (node._num, node.expr_node._num)
+        s = "  node%d -> node%d\n" % (self.nums[node], self.nums[node.expr_node])
         self.dot_body.append(s)
 
     def visit_Add(self, node):
         s = '  node%d [label="+"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.left, node.right):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Sub(self, node):
         s = '  node%d [label="-"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.left, node.right):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Comment(self, node):
@@ -145,23 +147,23 @@ class VisualizeAST(NodeVisitor):
             limit = limit[:12] + "..."
         s = '  node%d [label="Comment\n%s"]\n' % (self.count, limit)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_Return(self, node):
         s = '  node%d [label="Return"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         self.visit(node.expr_node)
-        s = "  node%d -> node%d\n" % (node._num, node.expr_node._num)
+        s = "  node%d -> node%d\n" % (self.nums[node], self.nums[node.expr_node])
         self.dot_body.append(s)
 
     def visit_Expr(self, node):
         s = '  node%d [label="%s"]\n' % (self.count, node)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         # self.visit(node.left)
@@ -169,19 +171,19 @@ class VisualizeAST(NodeVisitor):
 
         for child in (node.expr_node,):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Number(self, node):
         s = '  node%d [label="%s"]\n' % (self.count, node.token.value)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_Identifier(self, node):
         s = '  node%d [label="%s"]\n' % (self.count, node.token.value)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_String(self, node):
@@ -190,7 +192,7 @@ class VisualizeAST(NodeVisitor):
             node.token.value.replace('"', ""),
         )
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_Array(self, node):
@@ -199,7 +201,7 @@ class VisualizeAST(NodeVisitor):
             [str(v.token.value).replace('"', "") for v in node.elements],
         )
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_ArrayAccess(self, node):
@@ -216,7 +218,7 @@ class VisualizeAST(NodeVisitor):
                 node.index.token.value,
             )
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_Assign(self, node):
@@ -232,62 +234,62 @@ class VisualizeAST(NodeVisitor):
                 node.left.token.value,
             )
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         self.visit(node.expr)
-        s = "  node%d -> node%d\n" % (node._num, node.expr._num)
+        s = "  node%d -> node%d\n" % (self.nums[node], self.nums[node.expr])
         self.dot_body.append(s)
 
     def visit__True(self, node):
         s = '  node%d [label="True"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit__False(self, node):
         s = '  node%d [label="False"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_And(self, node):
         s = '  node%d [label="And"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.left, node.right):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Or(self, node):
         s = '  node%d [label="Or"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.left, node.right):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Not(self, node):
         s = '  node%d [label="Not"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         self.visit(node.node)
-        print("node._num", node._num, " -> ", node.node._num)
-        s = "  node%d -> node%d\n" % (node._num, node.node._num)
+        print("node._num", self.nums[node], " -> ", self.nums[node.node])
+        s = "  node%d -> node%d\n" % (self.nums[node], self.nums[node.node])
         self.dot_body.append(s)
 
     def visit_Conditional(self, node):
         s = '  node%d [label="Cond"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.condition, node.block):
@@ -295,13 +297,13 @@ class VisualizeAST(NodeVisitor):
                 continue
 
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_If(self, node):
         s = '  node%d [label="If"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.if_part, node.elif_parts, node.else_part):
@@ -313,79 +315,79 @@ class VisualizeAST(NodeVisitor):
                 self.count += 1
                 s = '  node%d [label="[else if]"]\n' % elif_blocks_count
                 self.dot_body.append(s)
-                s = "  node%d -> node%d\n" % (node._num, elif_blocks_count)
+                s = "  node%d -> node%d\n" % (self.nums[node], elif_blocks_count)
                 self.dot_body.append(s)
 
                 for elif_block in child:
                     self.visit(elif_block)
                     s = "  node%d -> node%d\n" % (
                         elif_blocks_count,
-                        elif_block._num,
+                        self.nums[elif_block],
                     )
                     self.dot_body.append(s)
             else:
                 self.visit(child)
-                s = "  node%d -> node%d\n" % (node._num, child._num)
+                s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
                 self.dot_body.append(s)
 
     def visit_Compare(self, node):
         s = '  node%d [label="Compare\n%s"]\n' % (self.count, node.op_type)
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.left, node.right):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_While(self, node):
         s = '  node%d [label="While"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.condition, node.block):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Break(self, node):
         s = '  node%d [label="Break"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_Continue(self, node):
         s = '  node%d [label="Continue"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
     def visit_RangeFor(self, node):
         s = '  node%d [label="For"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.var, node.iterable, node.block):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_For(self, node):
         s = '  node%d [label="For"]\n' % self.count
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
 
         for child in (node.init, node.cond, node.incr, node.block):
             self.visit(child)
-            s = "  node%d -> node%d\n" % (node._num, child._num)
+            s = "  node%d -> node%d\n" % (self.nums[node], self.nums[child])
             self.dot_body.append(s)
 
     def visit_Unknown(self, node):
         s = '  node%d [label="Unknown %s"]\n' % (self.count, type(node))
         self.dot_body.append(s)
-        node._num = self.count
+        self.nums[node] = self.count
         self.count += 1
@@ -0,0 +1,243 @@
+from compiler import BINARY_ADD
+from compiler import BINARY_DIV
+from compiler import BINARY_MOD
+from compiler import BINARY_MUL
+from compiler import BINARY_SUB
+from compiler import BINARY_SUBSCR
+from compiler import BUILD_AND
+from compiler import BUILD_ARRAY
+from compiler import BUILD_OR
+from compiler import CALL_BUILTIN
+from compiler import CALL_FUNCTION
+from compiler import CodeObject
+from compiler import compare_funcs
+from compiler import COMPARE_OP
+from compiler import Compiler
+from compiler import DEFINE_GLOBAL
+from compiler import DELETE_GLOBAL
+from compiler import ENTER_BLOCK
+from compiler import FOR_ITER
+from compiler import GET_ITER
+from compiler import JUMP
+from compiler import LEAVE_BLOCK
+from compiler import LOAD_CONST
+from compiler import LOAD_DEREF
+from compiler import LOAD_FAST
+from compiler import LOAD_GLOBAL
+from compiler import MAKE_CLOSURE
+from compiler import POP_JUMP_IF_FALSE
+from compiler import POP_TOP
+from compiler import RETURN_VALUE
+from compiler import STORE_DEREF
+from compiler import STORE_FAST
+from compiler import STORE_GLOBAL
+from compiler import STORE_SUBSCR
+from compiler import TAIL_CALL
+from compiler import UNARY_NEGATIVE
+from compiler import UNARY_NOT
+from exception import InterpreterError
+from interpreter import And
+from interpreter import Array
+from interpreter import is_number
+from interpreter import Not
+from interpreter import Or
+from interpreter import Range
+from interpreter import truthy
+
+
+class VM:
+    """基于栈的字节码虚拟机"""
+
+    def __init__(self):
+        self.globals = {}
+
+    def run(self, ast_tree):
+        self.execute(Compiler().compile(ast_tree))
+
+    def execute(self, code_obj: CodeObject):
+        globals_ = self.globals
+        # 调用栈, 保存调用者的 (code_obj, pc, stack, locals)
+        frames = []
+
+        code = code_obj.code
+        consts = code_obj.consts
+        # locals 的最后一个元素是外层函数的 locals, 主程序没有外层
+        locals_ = [None] * code_obj.nlocals + [None]
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+
+        while True:
+            op, arg = code[pc]
+            pc += 1
+
+            if op == LOAD_FAST:
+                value = locals_[arg]
+                if value is None:
+                    raise InterpreterError(
+                        "Identifier `%s` is not defined" % code_obj.varnames[arg]
+                    )
+                push(value)
+            elif op == LOAD_CONST:
+                push(consts[arg])
+            elif op == STORE_FAST:
+                locals_[arg] = pop()
+            elif op == LOAD_GLOBAL:
+                try:
+                    push(globals_[arg])
+                except KeyError:
+                    raise InterpreterError("Identifier `%s` is not defined" % arg)
+            elif op == POP_JUMP_IF_FALSE:
+                value = pop()
+                # 条件通常是比较运算的结果, 省去一次函数调用
+                if value is not True and (value is False or not truthy(value)):
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == COMPARE_OP:
+                right = pop()
+                stack[-1] = compare_funcs[arg](stack[-1], right)
+            elif op == BINARY_ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+            elif op == BINARY_SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+            elif op == CALL_FUNCTION:
+                func = stack[-arg - 1]
+                if not isinstance(func, CodeObject):
+                    raise InterpreterError("`%s` is not a function" % func)
+                # 多余的实参忽略, 缺少的形参保持未定义
+                nparams = len(func.params)
+                args = stack[len(stack) - arg :][:nparams]
+                del stack[-arg - 1 :]
+                frames.append((code_obj, pc, stack, locals_))
+
+                code_obj = func
+                code = func.code
+                consts = func.consts
+                locals_ = args + [None] * (func.nlocals - len(args))
+                locals_.append(func.outer)
+                stack = []
+                push = stack.append
+                pop = stack.pop
+                pc = 0
+            elif op == TAIL_CALL:
+                func = stack[-arg - 1]
+                if not isinstance(func, CodeObject):
+                    raise InterpreterError("`%s` is not a function" % func)
+                # 与 CALL_FUNCTION 相同, 但不保存当前的调用帧
+                nparams = len(func.params)
+                args = stack[len(stack) - arg :][:nparams]
+
+                code_obj = func
+                code = func.code
+                consts = func.consts
+                locals_ = args + [None] * (func.nlocals - len(args))
+                locals_.append(func.outer)
+                stack = []
+                push = stack.append
+                pop = stack.pop
+                pc = 0
+            elif op == RETURN_VALUE:
+                retval = pop()
+                if not frames:
+                    return retval
+                code_obj, pc, stack, locals_ = frames.pop()
+                code = code_obj.code
+                consts = code_obj.consts
+                push = stack.append
+                pop = stack.pop
+                push(retval)
+            elif op == CALL_BUILTIN:
+                func, argc = arg
+                if argc:
+                    args = stack[-argc:]
+                    del stack[-argc:]
+                else:
+                    args = []
+                push(func(args))
+            elif op == POP_TOP:
+                pop()
+            elif op == FOR_ITER:
+                try:
+                    push(next(stack[-1]))
+                except StopIteration:
+                    pop()
+                    pc = arg
+            elif op == STORE_GLOBAL:
+                if arg not in globals_:
+                    raise InterpreterError("Assign to an unknown variable `%s`" % arg)
+                globals_[arg] = pop()
+            elif op == DEFINE_GLOBAL:
+                globals_[arg] = pop()
+            elif op == BINARY_MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+            elif op == BINARY_DIV:
+                right = pop()
+                stack[-1] = stack[-1] / right
+            elif op == BINARY_MOD:
+                right = pop()
+                stack[-1] = stack[-1] % right
+            elif op == BINARY_SUBSCR:
+                index = pop()
+                array = stack[-1]
+                assert isinstance(array, (Array, Range))
+                assert is_number(index)
+                assert index < len(array.elements)
+                stack[-1] = array.elements[index]
+            elif op == STORE_SUBSCR:
+                value = pop()
+                index = pop()
+                array = pop()
+                assert isinstance(array, Array)
+                assert is_number(index)
+                assert index < len(array.elements)
+                array.store(index, value)
+            elif op == BUILD_ARRAY:
+                if arg:
+                    elements = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    elements = []
+                push(Array(elements))
+            elif op == BUILD_AND:
+                right = pop()
+                stack[-1] = And(stack[-1], right)
+            elif op == BUILD_OR:
+                right = pop()
+                stack[-1] = Or(stack[-1], right)
+            elif op == UNARY_NOT:
+                stack[-1] = Not(stack[-1])
+            elif op == UNARY_NEGATIVE:
+                stack[-1] = -stack[-1]
+            elif op == GET_ITER:
+                stack[-1] = iter(stack[-1])
+            elif op == DELETE_GLOBAL:
+                globals_.pop(arg, None)
+            elif op == LOAD_DEREF:
+                depth, slot, name = arg
+                outer = locals_
+                for _ in range(depth):
+                    outer = outer[-1]
+                value = outer[slot]
+                if value is None:
+                    raise InterpreterError("Identifier `%s` is not defined" % name)
+                push(value)
+            elif op == STORE_DEREF:
+                depth, slot, name = arg
+                outer = locals_
+                for _ in range(depth):
+                    outer = outer[-1]
+                outer[slot] = pop()
+            elif op == MAKE_CLOSURE:
+                stack[-1] = stack[-1].bind(locals_)
+            elif op == ENTER_BLOCK:
+                # block 的局部变量, 最后一个元素同样是外层的 locals
+                locals_ = [None] * len(arg) + [locals_]
+            elif op == LEAVE_BLOCK:
+                locals_ = locals_[-1]
+            else:
+                raise InterpreterError("Unknown opcode `%s`" % op)